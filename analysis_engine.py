@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import sentence_mixing as sm
+from sentence_mixing.model.exceptions import Interruption
+
+from data_model.phonem_index import PhonemIndex
+from data_model.video_cache import video_cache
+
+# Period (in seconds) of the interruption checks
+POLL_PERIOD = 0.05
+
+# Period (in seconds) of the checks that the worker process of an analysis
+# is alive
+LIVENESS_PERIOD = 1
+
+# Number of combos sent at once by a streaming analysis. The first combo is
+# always sent alone, to be previewed as soon as possible.
+STREAM_CHUNK_SIZE = 10
+
+# Videos loaded by the current worker process, by (url, seed)
+_videos = {}
+# Phonem index of the last analyzed video set, as ((urls, seed), index)
+_phonem_index = (None, None)
+
+
+def _init_worker(config, nodes, video_cache_folder, video_cache_config):
+    sm.logic.parameters.NODES = nodes
+    sm.sentence_mixer.prepare_sm_config_dict(config)
+    video_cache.set_folder(video_cache_folder)
+    video_cache.set_config(video_cache_config)
+
+
+def _get_videos(urls, seed):
+    """Loads the videos once per worker process"""
+
+    if any((url, seed) not in _videos for url in urls):
+        for video in video_cache.get_videos(urls, seed):
+            _videos.setdefault((video.url, seed), video)
+    videos = [_videos[(url, seed)] for url in urls]
+    video_cache.prepare_randomizer(videos, seed)
+    return videos
+
+
+class _InterruptionChecker:
+    """Interruption callback reading a shared event at most every
+    POLL_PERIOD seconds
+    """
+
+    def __init__(self, event):
+        self.event = event
+        self.interrupted = False
+        self.last_check = 0
+
+    def __call__(self):
+        now = time.monotonic()
+        if not self.interrupted and now - self.last_check >= POLL_PERIOD:
+            self.last_check = now
+            self.interrupted = self.event.is_set()
+        return self.interrupted
+
+
+def iter_chunks(combos):
+    """Groups combos in chunks of STREAM_CHUNK_SIZE, after a first chunk
+    holding only the first combo
+    """
+
+    chunk = []
+    first = True
+    for combo in combos:
+        chunk.append(combo)
+        if first or len(chunk) >= STREAM_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+            first = False
+    if len(chunk) > 0:
+        yield chunk
+
+
+def _analyze(sentence, urls, seed, interruption_event, chunk_queue, pid):
+    """Runs in a worker process. Puts the combos found in chunk_queue, as
+    lists of phonem project indexes, as soon as the search yields them.
+    Returns False if the analysis has been interrupted.
+    """
+
+    global _phonem_index
+
+    pid.value = os.getpid()
+    videos = _get_videos(urls, seed)
+    key = (tuple(urls), seed)
+    if _phonem_index[0] != key:
+        _phonem_index = (key, PhonemIndex(videos))
+    phonem_index = _phonem_index[1]
+    try:
+        combos = sm.sentence_mixer.process_sm(
+            sentence,
+            videos,
+            interrupt_callback=_InterruptionChecker(interruption_event),
+        )
+        for chunk in iter_chunks(combos):
+            chunk_queue.put(
+                [
+                    [
+                        phonem_index.get_project_index(ph)
+                        for ph in c.get_audio_phonems()
+                    ]
+                    for c in chunk
+                ]
+            )
+    except Interruption:
+        return False
+    return True
+
+
+class AnalysisEngine:
+    """Runs sentence mixing analyses in a pool of worker processes, so that
+    they are not serialized by the GIL.
+
+    Each worker process loads the videos it needs once and keeps them, tasks
+    only carry the sentence and the video urls. Results are streamed back as
+    chunks of serialized combos, to be restored with Combo.from_JSON_serializable.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.enabled = True
+        self.config = {}
+        self.nodes = None
+
+        self._pool = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def set_config(self, config, nodes):
+        self.config = config
+        self.nodes = nodes
+
+    def set_max_workers(self, max_workers):
+        """A value of 0 disables the engine: analyses run in threads"""
+        self.enabled = max_workers != 0
+        self.max_workers = max_workers or None
+
+    def is_enabled(self):
+        return self.enabled
+
+    def _start(self):
+        # Forking a process running Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._pool = context.Pool(
+            self.max_workers,
+            initializer=_init_worker,
+            initargs=(
+                self.config,
+                self.nodes,
+                video_cache.folder,
+                video_cache.config,
+            ),
+        )
+
+    def analyze(self, sentence, urls, seed, interrupt_callback):
+        """Yields chunks of serialized combos until the analysis is done.
+        Raises Interruption when interrupt_callback returns True.
+        """
+
+        with self._lock:
+            if self._pool is None:
+                self._start()
+            event = self._manager.Event()
+            chunk_queue = self._manager.Queue()
+            # Process running the analysis, 0 until it is started
+            pid = self._manager.Value("i", 0)
+            result = self._pool.apply_async(
+                _analyze, (sentence, urls, seed, event, chunk_queue, pid)
+            )
+
+        last_check = time.monotonic()
+        while not result.ready():
+            if interrupt_callback():
+                # The worker stops at its next interruption check
+                event.set()
+                raise Interruption(interrupt_callback)
+            try:
+                yield chunk_queue.get(timeout=POLL_PERIOD)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if now - last_check >= LIVENESS_PERIOD:
+                last_check = now
+                # The pool replaces a dead worker, but its task is lost
+                if not self._is_running(pid.value) and not result.ready():
+                    raise RuntimeError(
+                        "The analysis process stopped unexpectedly"
+                    )
+
+        # Every chunk has been queued before the task returned
+        while True:
+            try:
+                yield chunk_queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if not result.get():
+            raise Interruption(interrupt_callback)
+
+    def _is_running(self, pid):
+        """Returns False if pid is the one of a worker process which is not
+        alive anymore
+        """
+
+        if pid == 0:
+            return True
+        return any(p.pid == pid for p in multiprocessing.active_children())
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._manager.shutdown()
+                self._pool = None
+                self._manager = None
+
+
+analysis_engine = AnalysisEngine()
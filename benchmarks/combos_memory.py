@@ -0,0 +1,110 @@
+"""Memory used by the combos and the chosen combos of a synthetic project
+of 50k combos, compared with the former combos holding an instance dict and
+their list of phonems.
+
+Usage, from the repository root:
+python -m benchmarks.combos_memory [n_combos] [n_phonems]
+"""
+
+import random
+import sys
+import tracemalloc
+
+# Imported before model_ui.segment_model, which it imports, as the main
+# window does
+import view.commands  # noqa: F401
+from benchmarks.synthetic import make_videos
+from data_model.phonem_index import PhonemIndex
+from data_model.segment import Combo, Segment
+from model_ui.segment_model import ChosenCombo
+
+COMBOS_PER_SEGMENT = 50
+
+
+class BenchmarkProject:
+    """The part of a project used by combos"""
+
+    def __init__(self, videos):
+        self.videos = videos
+        self.phonem_index = PhonemIndex(videos)
+
+
+class DictCombo:
+    """Former combo: an instance dict and the list of its phonems"""
+
+    def __init__(self, phonems, segment, id):
+        self.id = id
+        self.segment = segment
+        self._phonems = phonems
+
+
+class DictChosenCombo:
+    """Former chosen combo, with an instance dict"""
+
+    def __init__(self, project, sentence="", index=0):
+        self.project = project
+        self.sentence = sentence
+        self.index = index
+
+
+def measure(build):
+    """Returns the bytes allocated by build and kept in its result"""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(n_combos=50000, n_phonems=20):
+    rng = random.Random(0)
+    project = BenchmarkProject(make_videos(20))
+    n_ids = len(project.phonem_index.phonems)
+    n_segments = n_combos // COMBOS_PER_SEGMENT
+    segments = [Segment(project, f"sentence {i}") for i in range(n_segments)]
+    combo_ids = [
+        [rng.randrange(n_ids) for _ in range(n_phonems)]
+        for _ in range(n_combos)
+    ]
+
+    def build_combos():
+        return [
+            Combo(None, segments[i // COMBOS_PER_SEGMENT], i, phonem_ids=ids)
+            for i, ids in enumerate(combo_ids)
+        ]
+
+    def build_dict_combos():
+        phonems = project.phonem_index.phonems
+        return [
+            DictCombo(
+                [phonems[i] for i in ids], segments[j // COMBOS_PER_SEGMENT], j
+            )
+            for j, ids in enumerate(combo_ids)
+        ]
+
+    def build_chosen_combos(cls):
+        return lambda: [
+            cls(project, f"sentence {i}", i % COMBOS_PER_SEGMENT)
+            for i in range(n_segments)
+        ]
+
+    print(f"{n_combos} combos of {n_phonems} phonems, {n_segments} segments")
+    for name, build, n in (
+        ("combo", build_combos, n_combos),
+        ("dict combo", build_dict_combos, n_combos),
+        ("chosen combo", build_chosen_combos(ChosenCombo), n_segments),
+        (
+            "dict chosen combo",
+            build_chosen_combos(DictChosenCombo),
+            n_segments,
+        ),
+    ):
+        size = measure(build)
+        print(f"{name}: {size / 2 ** 20:.1f} MiB, {size / n:.0f} B each")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
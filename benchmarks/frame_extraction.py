@@ -0,0 +1,90 @@
+"""Frames per second decoded for the previews of random combos of a video,
+by the frame extractor (one sequential pass over the video) and by the
+former extraction (one get_frame seek per frame).
+
+Usage, from the repository root:
+python -m benchmarks.frame_extraction video_file [n_combos] [n_phonems]
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+from moviepy.video.io.VideoFileClip import VideoFileClip
+
+from benchmarks.synthetic import Node
+from view.frame_cache import frame_cache
+from view.frame_extractor import frame_extractor, get_phonem_times
+from view.proxy import DOWNSCALE
+
+FPS = 15
+PHONEM_DURATION = 0.08
+
+
+def make_phonems(clip, url, n_phonems, rng):
+    """Returns phonems at random times of clip"""
+
+    video = Node(url=url)
+    sentence = Node(video=video)
+    word = Node(sentence=sentence)
+    phonems = []
+    for _ in range(n_phonems):
+        start = rng.uniform(0, clip.duration - PHONEM_DURATION)
+        phonems.append(
+            Node(
+                word=word,
+                start=start,
+                end=start + PHONEM_DURATION,
+                _get_original_video=lambda: clip,
+            )
+        )
+    return phonems
+
+
+def extract_by_seeks(phonems, fps):
+    """Former extraction of the frames of phonems"""
+    return [
+        [
+            p._get_original_video()
+            .get_frame(t)[::DOWNSCALE, ::DOWNSCALE]
+            .copy(order="C")
+            for t in np.arange(p.start, p.end, 1.0 / fps)
+        ]
+        for p in phonems
+    ]
+
+
+def measure(extract, combos):
+    start = time.perf_counter()
+    n_frames = sum(
+        len(frames) for phonems in combos for frames in extract(phonems, FPS)
+    )
+    return n_frames / (time.perf_counter() - start)
+
+
+def main(path, n_combos=10, n_phonems=20):
+    rng = random.Random(0)
+    clip = VideoFileClip(path, audio=False)
+    try:
+        combos = [
+            make_phonems(clip, path, n_phonems, rng) for _ in range(n_combos)
+        ]
+        n_frames = sum(
+            len(get_phonem_times(p, FPS)) for ps in combos for p in ps
+        )
+        print(f"{n_combos} combos of {n_phonems} phonems, {n_frames} frames")
+
+        frame_cache.clear()
+        extracted = measure(frame_extractor.extract, combos)
+        frame_cache.clear()
+        print(f"frame extractor: {extracted:.1f} frames/s")
+
+        seeked = measure(extract_by_seeks, combos)
+        print(f"get_frame seeks: {seeked:.1f} frames/s")
+    finally:
+        clip.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], *(int(arg) for arg in sys.argv[2:]))
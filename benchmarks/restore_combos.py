@@ -0,0 +1,58 @@
+"""Time to resolve the serialized phonem project indexes of combos, with
+the phonem index of the project and with the former scan of the project
+videos, and time to restore them as the combos of a segment.
+
+Usage, from the repository root:
+python -m benchmarks.restore_combos [n_combos] [n_videos]
+"""
+
+import sys
+import time
+
+from benchmarks.synthetic import make_serialized_combos, make_videos
+from data_model.phonem_index import PhonemIndex
+from data_model.segment import Segment
+
+
+class BenchmarkProject:
+    """The part of a project used to restore combos"""
+
+    def __init__(self, videos):
+        self.videos = videos
+        self.phonem_index = PhonemIndex(videos)
+
+
+def get_phonem_by_scan(project, index):
+    """Former resolution of a phonem project index"""
+    video = next(v for v in project.videos if v.url == index[0])
+    return video.subtitles[index[1]].words[index[2]].phonems[index[3]]
+
+
+def main(n_combos=10000, n_videos=20):
+    videos = make_videos(n_videos)
+    combos = make_serialized_combos(videos, n_combos)
+    project = BenchmarkProject(videos)
+    segment = Segment(project, "benchmark")
+
+    start = time.perf_counter()
+    for combo in combos:
+        project.phonem_index.get_phonem_ids(combo)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for combo in combos:
+        [get_phonem_by_scan(project, index) for index in combo]
+    scanned = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segment.restore_combos(combos)
+    restored = time.perf_counter() - start
+
+    print(f"{n_combos} combos of {len(combos[0])} phonems, {n_videos} videos")
+    print(f"resolution with the phonem index: {indexed:.3f} s")
+    print(f"resolution with a video scan:     {scanned:.3f} s")
+    print(f"restore_combos:                   {restored:.3f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
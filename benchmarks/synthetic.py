@@ -0,0 +1,49 @@
+"""Synthetic sentence mixing video graphs for the benchmarks"""
+
+import random
+
+
+class Node:
+    """Element of a video graph, compared by identity"""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def make_video(url, n_sentences=100, n_words=8, n_phonems=4):
+    """Builds the video -> subtitles -> words -> phonems graph of a video"""
+
+    video = Node(url=url, subtitles=[])
+    t = 0.0
+    for _ in range(n_sentences):
+        sentence = Node(video=video, words=[])
+        for _ in range(n_words):
+            word = Node(sentence=sentence, phonems=[])
+            for _ in range(n_phonems):
+                word.phonems.append(Node(word=word, start=t, end=t + 0.08))
+                t += 0.08
+            sentence.words.append(word)
+        video.subtitles.append(sentence)
+    return video
+
+
+def make_videos(n_videos):
+    return [make_video(f"https://example.com/{i}") for i in range(n_videos)]
+
+
+def make_serialized_combos(videos, n_combos, n_phonems=20, seed=0):
+    """Returns random combos as lists of phonem project indexes"""
+
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(n_combos):
+        combo = []
+        for _ in range(n_phonems):
+            video = rng.choice(videos)
+            i_sentence = rng.randrange(len(video.subtitles))
+            words = video.subtitles[i_sentence].words
+            i_word = rng.randrange(len(words))
+            i_phonem = rng.randrange(len(words[i_word].phonems))
+            combo.append([video.url, i_sentence, i_word, i_phonem])
+        combos.append(combo)
+    return combos
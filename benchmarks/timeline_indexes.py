@@ -0,0 +1,71 @@
+"""Time to compute the frame timeline of combos of 10, 100 and 1000
+phonems, with get_timeline_indexes and with the former loop over phonems.
+
+Usage, from the repository root: python -m benchmarks.timeline_indexes
+"""
+
+import random
+import timeit
+
+import numpy as np
+
+from view.preview import get_timeline_indexes
+
+FPS = 15
+SIZES = (10, 100, 1000)
+
+
+def get_timeline_indexes_by_loop(starts, ends, period):
+    """Former computation, one phonem at a time"""
+
+    phonem_ids = []
+    local_ids = []
+    s = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        n_frames = len(np.arange(start, end, period))
+        p_range = np.arange(start + s, end, period)
+        if len(p_range) == 0:
+            s -= end - start
+            continue
+        for k in np.round((p_range - start) / period):
+            phonem_ids.append(i)
+            local_ids.append(min(n_frames - 1, int(k)))
+        s = period - (end - p_range[-1])
+    return phonem_ids, local_ids
+
+
+def make_times(n_phonems, rng):
+    starts = [rng.uniform(0, 600) for _ in range(n_phonems)]
+    ends = [start + rng.uniform(0.02, 0.3) for start in starts]
+    return starts, ends
+
+
+def main():
+    rng = random.Random(0)
+    period = 1.0 / FPS
+    for n_phonems in SIZES:
+        starts, ends = make_times(n_phonems, rng)
+        number = max(1, 10000 // n_phonems)
+        vectorized = min(
+            timeit.repeat(
+                lambda: get_timeline_indexes(starts, ends, period),
+                number=number,
+                repeat=5,
+            )
+        )
+        looped = min(
+            timeit.repeat(
+                lambda: get_timeline_indexes_by_loop(starts, ends, period),
+                number=number,
+                repeat=5,
+            )
+        )
+        print(
+            f"{n_phonems} phonems: "
+            f"vectorized {vectorized / number * 1e6:.1f} us, "
+            f"loop {looped / number * 1e6:.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
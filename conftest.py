@@ -0,0 +1,2 @@
+# Makes the application packages importable by the tests when pytest is
+# run from any directory
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+
+import PySide2.QtCore as QtCore
+
+DEFAULT_FOLDER = ".analysis_cache"
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+EXTENSION = ".pickle"
+
+
+class AnalysisCache:
+    """Persistent cache of analysis results, shared across projects.
+
+    Entries are the serialized combos of a sentence (see
+    Combo.to_JSON_serializable), stored in one file per key. The key depends on
+    the sentence, the analyzed videos, the seed and the sentence mixing
+    configuration. When the total size of the entries exceeds max_size, the
+    least recently used entries are removed.
+    """
+
+    def __init__(self, folder=DEFAULT_FOLDER, max_size=DEFAULT_MAX_SIZE):
+        self.folder = folder
+        self.max_size = max_size
+        self.config = {}
+
+        # key -> entry size, ordered from least to most recently used
+        self._entries = None
+        self._size = 0
+        self._lock = QtCore.QMutex()
+
+    def set_folder(self, folder):
+        self._lock.lock()
+        self.folder = folder
+        self._entries = None
+        self._lock.unlock()
+
+    def set_max_size(self, max_size):
+        self._lock.lock()
+        self.max_size = max_size
+        if self._entries is not None:
+            self._evict()
+        self._lock.unlock()
+
+    def set_config(self, config):
+        """Sets the sentence mixing configuration the results depend on"""
+        self.config = config
+
+    def get_key(self, sentence, urls, seed):
+        key = json.dumps(
+            [sentence, sorted(urls), str(seed), self.config],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the serialized combos stored at key, or None"""
+
+        self._lock.lock()
+        try:
+            self._load_entries()
+            if key not in self._entries:
+                return None
+            path = self._get_path(key)
+            try:
+                with open(path, "rb") as f:
+                    serialized_combos = pickle.load(f)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return serialized_combos
+        finally:
+            self._lock.unlock()
+
+    def put(self, key, serialized_combos):
+        data = pickle.dumps(serialized_combos, protocol=4)
+
+        self._lock.lock()
+        try:
+            self._load_entries()
+            path = self._get_path(key)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print("Unable to write analysis cache entry: " + str(e))
+                return
+
+            if key in self._entries:
+                self._size -= self._entries[key]
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._size += len(data)
+            self._evict()
+        finally:
+            self._lock.unlock()
+
+    def clear(self):
+        self._lock.lock()
+        self._load_entries()
+        for key in list(self._entries.keys()):
+            self._remove(key)
+        self._lock.unlock()
+
+    def _get_path(self, key):
+        return os.path.join(self.folder, key + EXTENSION)
+
+    def _load_entries(self):
+        """Scans the cache folder the first time it is needed"""
+
+        if self._entries is not None:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(EXTENSION):
+                continue
+            stat = os.stat(os.path.join(self.folder, name))
+            entries.append(
+                (stat.st_mtime, name[: -len(EXTENSION)], stat.st_size)
+            )
+        entries.sort()
+
+        self._entries = OrderedDict((key, size) for _, key, size in entries)
+        self._size = sum(self._entries.values())
+        self._evict()
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key)
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._size > self.max_size and len(self._entries) > 0:
+            self._remove(next(iter(self._entries)))
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,62 @@
+import mmap
+import pickle
+
+
+class ProjectFileMapping:
+    """Read-only memory mapping of the combo blobs area of a p00p file"""
+
+    def __init__(self, path, data_start):
+        self.data_start = data_start
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset, size):
+        start = self.data_start + offset
+        return self._map[start : start + size]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
+
+    def is_closed(self):
+        return self._map is None
+
+
+class CombosBlob:
+    """Serialized combos of a segment, decoded on demand.
+
+    The data is either held in memory or read from the project file mapping.
+    urls are the videos the combos are made of; they allow to check the blob
+    against the project videos without decoding it.
+    """
+
+    def __init__(self, urls, data=None, mapping=None, offset=0, size=0):
+        self.urls = frozenset(urls)
+        self._data = data
+        self._mapping = mapping
+        self._offset = offset
+        self._size = size
+
+    def from_serialized_combos(serialized_combos):
+        urls = {index[0] for c in serialized_combos for index in c}
+        return CombosBlob(
+            urls, data=pickle.dumps(serialized_combos, protocol=4)
+        )
+
+    def get_bytes(self):
+        if self._data is not None:
+            return self._data
+        return self._mapping.read(self._offset, self._size)
+
+    def load(self):
+        """Returns the serialized combos (lists of phonem project indexes)"""
+        return pickle.loads(self.get_bytes())
+
+    def detach(self):
+        """Copies the data in memory, so that the mapping can be closed"""
+        if self._data is None:
+            self._data = self.get_bytes()
+            self._mapping = None
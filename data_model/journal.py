@@ -0,0 +1,72 @@
+import json
+import os
+
+EXTENSION = ".journal"
+
+
+def get_journal_path(project_path):
+    return project_path + EXTENSION
+
+
+class ProjectJournal:
+    """Append-only journal of the changes made to a project since its last
+    save.
+
+    Each record is a JSON object written on its own line and flushed right
+    away, so a crash loses at most the record being written. Compaction
+    replaces the records with a single snapshot record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def read_records(self):
+        """Returns the journal records, ignoring a truncated last line"""
+
+        records = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+        except OSError:
+            pass
+        return records
+
+    def append(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self.record_count += 1
+
+    def compact(self, snapshot):
+        """Replaces every record with a snapshot record"""
+
+        self.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "snapshot", "snapshot": snapshot}))
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+        self.record_count = 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self.record_count = 0
@@ -0,0 +1,193 @@
+import itertools
+
+import numpy as np
+
+# Phonem ids are only unique within an index: keys built from phonem ids
+# also hold the namespace of their index
+_namespaces = itertools.count()
+
+
+class PhonemIndex:
+    """Flat index of the phonems of the project videos.
+
+    Phonems are stored in a single list and addressed by project indexes
+    (url, sentence, word, phonem) through offset tables, so resolving an index
+    costs a few list accesses instead of a scan of the project videos.
+    The position of a phonem in the list is its phonem id. Ids never change
+    once a video is added.
+
+    The phonem table holds, for each phonem id, its video id (index in urls),
+    start, end, and sentence, word and phonem indexes, as numpy arrays.
+    """
+
+    def __init__(self, videos=()):
+        self.namespace = next(_namespaces)
+        self.videos = {}
+        self.phonems = []
+
+        # url -> offset of the first sentence of the video in _sentence_offsets
+        self._video_offsets = {}
+        # url -> offset following the last sentence of the video
+        self._video_ends = {}
+        # Offset of the first word of each sentence in _word_offsets
+        self._sentence_offsets = []
+        # Offset of the first phonem of each word in phonems
+        self._word_offsets = []
+
+        # id(phonem) -> phonem id
+        self._ids = {}
+
+        # Phonem table
+        self.urls = []
+        self.video_ids = np.empty(0, dtype=np.int32)
+        self.starts = np.empty(0, dtype=np.float64)
+        self.ends = np.empty(0, dtype=np.float64)
+        self.sentence_indexes = np.empty(0, dtype=np.int32)
+        self.word_indexes = np.empty(0, dtype=np.int32)
+        self.phonem_indexes = np.empty(0, dtype=np.int32)
+
+        for video in videos:
+            self.add_video(video)
+
+    def add_video(self, video):
+        if video.url in self.videos:
+            return
+
+        self.videos[video.url] = video
+        self._video_offsets[video.url] = len(self._sentence_offsets)
+
+        first_id = len(self.phonems)
+        times = []
+        indexes = []
+        for i_sentence, sentence in enumerate(video.subtitles):
+            self._sentence_offsets.append(len(self._word_offsets))
+            for i_word, word in enumerate(sentence.words):
+                self._word_offsets.append(len(self.phonems))
+                for i_phonem, phonem in enumerate(word.phonems):
+                    self._ids[id(phonem)] = len(self.phonems)
+                    times.append((phonem.start, phonem.end))
+                    indexes.append((i_sentence, i_word, i_phonem))
+                    self.phonems.append(phonem)
+
+        self._video_ends[video.url] = len(self._sentence_offsets)
+
+        n = len(self.phonems) - first_id
+        times = np.array(times, dtype=np.float64).reshape((n, 2))
+        indexes = np.array(indexes, dtype=np.int32).reshape((n, 3))
+        self.video_ids = np.concatenate(
+            (self.video_ids, np.full(n, len(self.urls), dtype=np.int32))
+        )
+        self.urls.append(video.url)
+        self.starts = np.concatenate((self.starts, times[:, 0]))
+        self.ends = np.concatenate((self.ends, times[:, 1]))
+        self.sentence_indexes = np.concatenate(
+            (self.sentence_indexes, indexes[:, 0])
+        )
+        self.word_indexes = np.concatenate((self.word_indexes, indexes[:, 1]))
+        self.phonem_indexes = np.concatenate(
+            (self.phonem_indexes, indexes[:, 2])
+        )
+
+    def get_video(self, url):
+        return self.videos[url]
+
+    def get_phonem_id(self, index):
+        """Returns the phonem id of a project index.
+        Raises KeyError if the video is not indexed and IndexError if the index
+        does not exist in the video.
+        """
+
+        url, i_sentence, i_word, i_phonem = index
+        sentence_offset = self._get_offset(
+            self._video_offsets[url], i_sentence, self._video_ends[url],
+        )
+        word_offset = self._get_offset(
+            self._sentence_offsets[sentence_offset],
+            i_word,
+            self._get_end(
+                self._sentence_offsets, sentence_offset, self._word_offsets
+            ),
+        )
+        return self._get_offset(
+            self._word_offsets[word_offset],
+            i_phonem,
+            self._get_end(self._word_offsets, word_offset, self.phonems),
+        )
+
+    def _get_offset(self, start, i, end):
+        """Raises IndexError if the element is outside of its parent"""
+        if i < 0 or start + i >= end:
+            raise IndexError("Phonem index out of range")
+        return start + i
+
+    def _get_end(self, offsets, i, children):
+        if i + 1 < len(offsets):
+            return offsets[i + 1]
+        return len(children)
+
+    def get_phonem(self, index):
+        return self.phonems[self.get_phonem_id(index)]
+
+    def get_phonem_ids(self, indexes):
+        return np.array(
+            [self.get_phonem_id(index) for index in indexes], dtype=np.int32
+        )
+
+    def get_phonems(self, phonem_ids):
+        return [self.phonems[i] for i in phonem_ids]
+
+    def get_id_of_phonem(self, phonem):
+        """Raises KeyError if the phonem does not belong to indexed videos"""
+        return self._ids[id(phonem)]
+
+    def get_project_index(self, phonem):
+        return self.get_project_indexes([self.get_id_of_phonem(phonem)])[0]
+
+    def get_project_indexes(self, phonem_ids):
+        """Returns the (url, sentence, word, phonem) index of each phonem id"""
+        phonem_ids = np.asarray(phonem_ids, dtype=np.int64)
+        return [
+            (self.urls[v], s, w, p)
+            for v, s, w, p in zip(
+                self.video_ids[phonem_ids].tolist(),
+                self.sentence_indexes[phonem_ids].tolist(),
+                self.word_indexes[phonem_ids].tolist(),
+                self.phonem_indexes[phonem_ids].tolist(),
+            )
+        ]
+
+    def __len__(self):
+        return len(self.phonems)
+
+
+class PhonemsKey:
+    """Hashable key identifying a sequence of phonems by their phonem ids in
+    a phonem index, and the namespace of that index. The hash is computed
+    once.
+    """
+
+    __slots__ = ("namespace", "_bytes", "_hash")
+
+    def __init__(self, phonem_ids, namespace):
+        self.namespace = namespace
+        self._bytes = np.asarray(phonem_ids, dtype=np.int32).tobytes()
+        self._hash = hash((namespace, self._bytes))
+
+    def get_phonem_ids(self):
+        return np.frombuffer(self._bytes, dtype=np.int32)
+
+    def __eq__(self, other):
+        return self is other or (
+            isinstance(other, PhonemsKey)
+            and self._hash == other._hash
+            and self.namespace == other.namespace
+            and self._bytes == other._bytes
+        )
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return (
+            f"<PhonemsKey {self.namespace}: {self.get_phonem_ids().tolist()}>"
+        )
@@ -4,15 +4,22 @@ from copy import copy
 import PySide2.QtCore as QtCore
 import PySide2.QtWidgets as QtWidgets
 
+from data_model.container import CombosBlob, ProjectFileMapping
+from data_model.phonem_index import PhonemIndex
 from data_model.segment import Segment
 from model_ui.segment_model import ChosenCombo
 
-FORMAT_VERSION = 2
+# Version 4 splits the file in a header, a segment table and one combos blob
+# per segment. Older versions pickle the whole project at once.
+FORMAT_VERSION = 4
+LAST_PICKLE_FORMAT_VERSION = 3
 MAGIC_NUMBER = 0x70303070
 
 
 def load_project(project_path):
-    """Loads project from p00p file"""
+    """Loads project from p00p file.
+    Combos are not decoded: they are read from the file when needed.
+    """
     file = QtCore.QFile(project_path)
     if not file.open(QtCore.QIODevice.ReadOnly):
         raise EnvironmentError(file.errorString())
@@ -30,12 +37,28 @@ def load_project(project_path):
             raise EnvironmentError("File too new for this version.")
         in_.setVersion(QtCore.QDataStream.Qt_5_14)
 
-        # Read the data
+        # Read the data (whole schema for pickle based versions, header
+        # and segment table otherwise)
         data_size = in_.readInt32()
         data = in_.readRawData(data_size)
+        data_start = file.pos()
 
         file.close()
-        return Project.from_JSON_serializable(pickle.loads(bytes(data)), project_path)
+
+        schema = pickle.loads(bytes(data))
+        if version <= LAST_PICKLE_FORMAT_VERSION:
+            return Project.from_JSON_serializable(schema, project_path)
+
+        try:
+            mapping = ProjectFileMapping(project_path, data_start)
+        except (OSError, ValueError) as e:
+            raise EnvironmentError(str(e))
+        return Project.from_container(schema, mapping, project_path)
+
+
+class ProjectSignals(QtCore.QObject):
+    # Emitted with the url of each video added to the project
+    videoReady = QtCore.Signal(str)
 
 
 class Project:
@@ -43,57 +66,160 @@ class Project:
         self.set_path(path)
         self.seed = seed
         self.urls = urls
-        self.videos = None
+        self.videos = []
+        self.phonem_index = None
+        self.signals = ProjectSignals()
         self.segments = {}
         self.ordered_segments = []
         self.ready = False
 
+        # Mapping of the project file the combos blobs are read from
+        self._mapping = None
+
     def from_JSON_serializable(schema, path):
         p = Project(path, schema["seed"], schema["urls"])
         p.ordered_segments = [ChosenCombo.from_JSON_serializable(p, c) for c in schema["ordered_segments"]]
+        # Files older than version 3 do not store analyzed combos
+        for obj in schema.get("segments", []):
+            p.get_segment(obj["_sentence"]).set_combos_blob(
+                CombosBlob.from_serialized_combos(obj["combos"])
+            )
+        return p
+
+    def from_container(header, mapping, path):
+        p = Project.from_JSON_serializable(header, path)
+        p._mapping = mapping
+        for entry in header["segment_table"]:
+            p.get_segment(entry["sentence"]).set_combos_blob(
+                CombosBlob(
+                    entry["urls"],
+                    mapping=mapping,
+                    offset=entry["offset"],
+                    size=entry["size"],
+                )
+            )
         return p
 
     def to_JSON_serializable(self):
         schema = {
             "seed": self.seed,
             "urls": self.urls,
-            "ordered_segments": [c.to_JSON_serializable() for c in self.ordered_segments]
+            "ordered_segments": [c.to_JSON_serializable() for c in self.ordered_segments],
         }
         return schema
 
-    def set_videos(self, videos):
-        assert not self.are_videos_ready()
-        self.videos = videos
-
-    def init_project(self, videos):
-        self.set_videos(videos)
-
-        for chosenCombo in self.ordered_segments:
-            if chosenCombo.sentence not in self.segments:
-                self.create_segment(chosenCombo.sentence)
-        self.ready = True
+    def _get_combos_blobs(self):
+        """Returns the (sentence, combos blob) of the analyzed segments used
+        by ordered segments
+        """
+
+        sentences = {c.sentence for c in self.ordered_segments}
+        blobs = []
+        for sentence in sorted(sentences):
+            if sentence in self.segments:
+                blob = self.segments[sentence].get_combos_blob()
+                if blob is not None:
+                    blobs.append((sentence, blob))
+        return blobs
+
+    def _close_mapping(self):
+        """Detaches every blob from the project file mapping and closes it"""
+
+        if self._mapping is None:
+            return
+        for segment in self.segments.values():
+            segment.detach_combos_blob()
+        self._mapping.close()
+        self._mapping = None
+
+    def get_video_urls(self):
+        """Returns the urls of the project videos, in project order"""
+        return self.urls[0]
+
+    def get_loaded_urls(self):
+        """Returns the urls of the videos added to the project"""
+        if self.phonem_index is None:
+            return set()
+        return set(self.phonem_index.videos.keys())
+
+    def add_video(self, video):
+        """Adds a loaded video to the project. Sentences can be analyzed with
+        the videos added so far, and analyzed again when the others arrive.
+        """
+
+        if self.phonem_index is None:
+            self.phonem_index = PhonemIndex()
+            for chosenCombo in self.ordered_segments:
+                if chosenCombo.sentence not in self.segments:
+                    self.create_segment(chosenCombo.sentence)
+
+        self.phonem_index.add_video(video)
+        order = {url: i for i, url in enumerate(self.get_video_urls())}
+        self.videos = sorted(
+            self.phonem_index.videos.values(),
+            key=lambda v: order.get(v.url, len(order)),
+        )
+
+        all_added = (
+            not self.ready
+            and set(self.get_video_urls()) <= self.get_loaded_urls()
+        )
+        if all_added:
+            # Combos made of videos missing from the project need a new
+            # analysis
+            for segment in self.segments.values():
+                segment.check_combos_blob(self.get_loaded_urls())
+            self.ready = True
+
+        self.signals.videoReady.emit(video.url)
 
     def set_path(self, path):
         if path is not None and not path.endswith(".p00p"):
             path += ".p00p"
         self.path = path
 
-    def are_videos_ready(self):
-        return self.videos is not None and self.ready
+    def has_videos(self):
+        """Returns True once at least one video is added"""
+        return len(self.videos) > 0
 
     def save(self):
         """Saves the project at project path as p00p file"""
-        file = QtCore.QFile(self.path)
+        blobs = self._get_combos_blobs()
+        data = [blob.get_bytes() for _, blob in blobs]
+
+        segment_table = []
+        offset = 0
+        for (sentence, blob), blob_data in zip(blobs, data):
+            segment_table.append(
+                {
+                    "sentence": sentence,
+                    "offset": offset,
+                    "size": len(blob_data),
+                    "urls": sorted(blob.urls),
+                }
+            )
+            offset += len(blob_data)
+
+        header = self.to_JSON_serializable()
+        header["segment_table"] = segment_table
+
+        # The saved file may be the mapped one
+        self._close_mapping()
+
+        file = QtCore.QSaveFile(self.path)
         if not file.open(QtCore.QIODevice.WriteOnly):
             raise EnvironmentError(file.errorString())
         else:
-            data = QtCore.QByteArray(pickle.dumps(self.to_JSON_serializable(), protocol=4))
+            header_data = QtCore.QByteArray(pickle.dumps(header, protocol=4))
             out = QtCore.QDataStream(file)
             out.writeInt32(MAGIC_NUMBER)
             out.writeInt32(FORMAT_VERSION)
             out.setVersion(QtCore.QDataStream.Qt_5_14)
-            out << data
-            file.close()
+            out << header_data
+            for blob_data in data:
+                out.writeRawData(blob_data)
+            if not file.commit():
+                raise EnvironmentError(file.errorString())
 
     def duplicate_segment(self, segment):
         """Performs a shallow copy of the given segment and appends it to the segment list"""
@@ -1,40 +1,47 @@
+import numpy as np
 import sentence_mixing.sentence_mixer as sm
 from sentence_mixing.model.exceptions import Interruption
 
+from analysis_engine import analysis_engine, iter_chunks
+from data_model.analysis_cache import analysis_cache
+from data_model.container import CombosBlob
+from data_model.phonem_index import PhonemsKey
+from data_model.video_cache import video_cache
 
-def get_phonem_project_index(ph, project):
-    return (
-        ph.word.sentence.video.url,
-        ph.word.sentence.get_index_in_video(),
-        ph.word.get_index_in_sentence(),
-        ph.get_index_in_word(),
-    )
 
+class Combo:
+    # Projects hold many combos: no instance dict
+    __slots__ = ("id", "segment", "phonem_ids", "_hash", "_phonems_key")
 
-def get_phonem_from_project_index(index, project):
-    """Fail if the video is not present in the projects videos"""
-    v = next(v for v in project.videos if v.url == index[0])
-    return v.subtitles[index[1]].words[index[2]].phonems[index[3]]
-
+    def __init__(self, sm_combo, segment, id, phonem_ids=None):
+        """The phonems of the combo are given either by sm_combo (a
+        sentence mixing combo or a list of phonems) or by their phonem ids
+        """
 
-class Combo:
-    def __init__(self, sm_combo, segment, id):
         self.id = id
         self.segment = segment
-        if type(sm_combo) == list:
-            self._phonems = sm_combo
-        else:
-            self._phonems = sm_combo.get_audio_phonems()
+        if phonem_ids is None:
+            if isinstance(sm_combo, list):
+                phonems = sm_combo
+            else:
+                phonems = sm_combo.get_audio_phonems()
+            phonem_index = segment.project.phonem_index
+            phonem_ids = [phonem_index.get_id_of_phonem(ph) for ph in phonems]
+        self.phonem_ids = np.asarray(phonem_ids, dtype=np.int32)
+        # The sentence of a segment never changes
+        self._hash = hash((segment._sentence, id))
+        self._phonems_key = None
 
     def __eq__(self, other):
-        return (
-            type(self) == type(other)
+        return self is other or (
+            isinstance(other, Combo)
+            and self._hash == other._hash
             and self.segment._sentence == other.segment._sentence
-            and self.get_index() == other.get_index()
+            and self.id == other.id
         )
 
     def __hash__(self):
-        return hash((self.segment._sentence, self.get_index()))
+        return self._hash
 
     def __repr__(self):
         return str((self.segment._sentence, self.get_index()))
@@ -43,17 +50,29 @@ class Combo:
         return self.id
 
     def get_audio_phonems(self):
-        return self._phonems
+        return self.segment.project.phonem_index.get_phonems(self.phonem_ids)
+
+    def get_phonems_key(self):
+        """Returns the key of the combo phonems, used by preview caches"""
+        if self._phonems_key is None:
+            self._phonems_key = PhonemsKey(
+                self.phonem_ids, self.segment.project.phonem_index.namespace
+            )
+        return self._phonems_key
+
+    def get_phonem_times(self):
+        """Returns the starts and the ends of the combo phonems"""
+        phonem_index = self.segment.project.phonem_index
+        return (
+            phonem_index.starts[self.phonem_ids],
+            phonem_index.ends[self.phonem_ids],
+        )
 
     def to_JSON_serializable(self, project):
-        return [get_phonem_project_index(ph, project) for ph in self._phonems]
+        return project.phonem_index.get_project_indexes(self.phonem_ids)
 
     def from_JSON_serializable(obj, project, seg, id):
-        return Combo(
-            [get_phonem_from_project_index(index, project) for index in obj],
-            seg,
-            id,
-        )
+        return Combo(None, seg, id, project.phonem_index.get_phonem_ids(obj))
 
 
 class Segment:
@@ -62,37 +81,195 @@ class Segment:
         self._sentence = sentence
         self.set_combos(combos)
 
+    @property
+    def combos(self):
+        # Combos loaded from the project file are decoded on first access,
+        # once their videos are added to the project
+        if self._combos_blob is not None and not self.is_waiting_for_videos():
+            blob = self._combos_blob
+            self._combos_blob = None
+            try:
+                self.restore_combos(blob.load())
+            except (KeyError, IndexError):
+                # Videos have changed since the save, a new analysis is needed
+                print(
+                    "Unable to restore combos of sentence '"
+                    + self._sentence
+                    + "'"
+                )
+        return self._combos
+
     def to_JSON_serializable(self):
-        obj = self.__dict__.copy()
-        obj["combos"] = [
-            c.to_JSON_serializable(self.project) for c in self.combos
-        ]
-        obj.pop("project")
-        return obj
+        return {
+            "_sentence": self._sentence,
+            "combos": [
+                c.to_JSON_serializable(self.project) for c in self.combos
+            ],
+        }
 
     def from_JSON_serializable(obj, project):
-        seg = Segment(project, obj["_sentence"], obj["_current_combo_index"])
-        seg.set_combos(
-            [
-                Combo.from_JSON_serializable(c, project, seg, i)
-                for i, c in enumerate(obj["combos"])
-            ]
-        )
+        seg = Segment(project, obj["_sentence"])
+        seg.restore_combos(obj["combos"])
         return seg
 
-    def analyze(self, interrupt_callback):
+    def restore_combos(self, serialized_combos):
+        """Sets the combos from their serialized phonem indexes.
+        The project videos must be loaded.
+        """
+
         self.set_combos(
             [
-                Combo(c, self, i)
-                for i, c in enumerate(
+                Combo.from_JSON_serializable(c, self.project, self, i)
+                for i, c in enumerate(serialized_combos)
+            ]
+        )
+
+    def set_combos_blob(self, blob):
+        """Sets serialized combos that will be decoded when needed"""
+        self._combos = []
+        self._combos_blob = blob
+        self._complete = True
+        self._analysis_urls = None
+
+    def get_combos_blob(self):
+        """Returns the serialized combos, without decoding pending ones.
+        Returns None if the segment is not analyzed, or only analyzed with
+        some of the project videos.
+        """
+
+        if self._combos_blob is not None:
+            return self._combos_blob
+        if (
+            len(self._combos) == 0
+            or not self._complete
+            or self._analysis_urls is not None
+            or self.is_empty()
+        ):
+            return None
+        return CombosBlob.from_serialized_combos(
+            [c.to_JSON_serializable(self.project) for c in self._combos]
+        )
+
+    def detach_combos_blob(self):
+        if self._combos_blob is not None:
+            self._combos_blob.detach()
+
+    def check_combos_blob(self, urls):
+        """Drops pending combos using videos not found in urls"""
+        if (
+            self._combos_blob is not None
+            and not self._combos_blob.urls <= set(urls)
+        ):
+            self._combos_blob = None
+
+    def has_combos(self):
+        return len(self._combos) > 0 or self._combos_blob is not None
+
+    def is_waiting_for_videos(self):
+        """Returns True if the combos loaded from the project file use videos
+        not added to the project yet
+        """
+        return (
+            self._combos_blob is not None
+            and not self._combos_blob.urls <= self.project.get_loaded_urls()
+        )
+
+    def analyze(self, interrupt_callback, combos_callback=None):
+        """Appends the combos to the segment as the search finds them.
+        combos_callback is called after each appended chunk of combos.
+        """
+
+        if self.load_from_cache():
+            return
+
+        # Videos may be added to the project during the analysis
+        videos = list(self.project.videos)
+        urls = [v.url for v in videos]
+
+        self._combos = []
+        self._combos_blob = None
+        self._complete = False
+        try:
+            if analysis_engine.is_enabled():
+                serialized_combos = []
+                for chunk in analysis_engine.analyze(
+                    self._sentence,
+                    urls,
+                    self.project.seed,
+                    interrupt_callback,
+                ):
+                    self._append_combos(
+                        [
+                            Combo.from_JSON_serializable(
+                                c, self.project, self, len(self._combos) + i
+                            )
+                            for i, c in enumerate(chunk)
+                        ],
+                        combos_callback,
+                    )
+                    serialized_combos.extend(chunk)
+            else:
+                video_cache.prepare_randomizer(videos, self.project.seed)
+                for chunk in iter_chunks(
                     sm.process_sm(
                         self._sentence,
-                        self.project.videos,
+                        videos,
                         interrupt_callback=interrupt_callback,
                     )
-                )
-            ]
-        )
+                ):
+                    self._append_combos(
+                        [
+                            Combo(c, self, len(self._combos) + i)
+                            for i, c in enumerate(chunk)
+                        ],
+                        combos_callback,
+                    )
+                serialized_combos = [
+                    c.to_JSON_serializable(self.project) for c in self._combos
+                ]
+        except Interruption:
+            # Partial results would not be analyzed again
+            self.set_combos([])
+            raise
+        self._complete = True
+        self._set_analysis_urls(urls)
+
+        if len(serialized_combos) > 0:
+            analysis_cache.put(self._get_cache_key(urls), serialized_combos)
+
+    def _append_combos(self, combos, combos_callback):
+        self._combos.extend(combos)
+        if combos_callback is not None:
+            combos_callback()
+
+    def _set_analysis_urls(self, urls):
+        """Records the videos of an analysis made before every project video
+        is added
+        """
+
+        if set(urls) >= set(self.project.get_video_urls()):
+            self._analysis_urls = None
+        else:
+            self._analysis_urls = frozenset(urls)
+
+    def _get_cache_key(self, urls):
+        return analysis_cache.get_key(self._sentence, urls, self.project.seed)
+
+    def load_from_cache(self):
+        """Restores the combos from the analysis cache.
+        Returns True if the segment has been restored.
+        """
+
+        urls = [v.url for v in self.project.videos]
+        serialized_combos = analysis_cache.get(self._get_cache_key(urls))
+        if serialized_combos is None:
+            return False
+        try:
+            self.restore_combos(serialized_combos)
+        except (KeyError, IndexError):
+            return False
+        self._set_analysis_urls(urls)
+        return True
 
     def get_sentence(self):
         return self._sentence
@@ -101,16 +278,33 @@ class Segment:
         return not self.is_analyzing()
 
     def is_analyzing(self):
-        return len(self.combos) == 0
+        return not self.has_combos()
 
     def need_analysis(self):
-        return len(self.combos) == 0 and not self.is_empty()
+        return (
+            not self.has_combos() or not self._complete
+        ) and not self.is_empty()
+
+    def need_refinement(self):
+        """Returns True if the combos have been found before videos were
+        added to the project
+        """
+        return (
+            self._analysis_urls is not None
+            and self._analysis_urls != self.project.get_loaded_urls()
+        )
 
     def is_empty(self):
         return self._sentence == ""
 
     def set_combos(self, combos):
-        self.combos = combos
+        self._combos = combos
+        self._combos_blob = None
+        # False while an analysis is appending combos
+        self._complete = True
+        # Videos of the analysis if it misses project videos, see
+        # need_refinement
+        self._analysis_urls = None
 
     def get_combo_index(self, combo):
         return self.combo.id
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import PySide2.QtCore as QtCore
+import sentence_mixing as sm
+from sentence_mixing.logic.global_audio_data import audioDataFactory
+
+DEFAULT_FOLDER = ".video_cache"
+EXTENSION = ".pickle"
+
+# Version of the cache entries, to be increased when their content changes
+FORMAT_VERSION = 1
+
+
+def get_sm_version():
+    try:
+        import pkg_resources
+
+        return pkg_resources.get_distribution("sentence_mixing").version
+    except Exception:
+        return getattr(sm, "__version__", "")
+
+
+class VideoCache:
+    """Persistent cache of the videos loaded by sentence mixing.
+
+    Loading a video parses its subtitles and their phonem alignment into a
+    video -> subtitles -> words -> phonems object graph. The graph of each
+    video is pickled in its own file, keyed by the video url, the seed, the
+    sentence mixing version and configuration: changing any of them makes the
+    entry unreachable.
+    """
+
+    def __init__(self, folder=DEFAULT_FOLDER):
+        self.folder = folder
+        self.config = {}
+        self.sm_version = get_sm_version()
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = QtCore.QMutex()
+        # Sentence mixing keeps its state in globals and files shared by
+        # every call
+        self._sm_lock = QtCore.QMutex()
+
+    def set_folder(self, folder):
+        self.folder = folder
+
+    def set_config(self, config):
+        """Sets the sentence mixing configuration the videos depend on"""
+        self.config = config
+
+    def get_key(self, url, seed):
+        key = json.dumps(
+            [FORMAT_VERSION, self.sm_version, url, str(seed), self.config],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.folder, key + EXTENSION)
+
+    def get(self, url, seed):
+        """Returns the cached video, or None"""
+
+        path = self._get_path(self.get_key(url, seed))
+        video = None
+        try:
+            with open(path, "rb") as f:
+                video = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Entries written by other versions of the classes
+            print("Unable to read video cache entry: " + str(e))
+
+        self._lock.lock()
+        if video is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._lock.unlock()
+        return video
+
+    def put(self, url, seed, video):
+        try:
+            data = pickle.dumps(video, protocol=4)
+        except Exception as e:
+            print("Unable to serialize video " + url + ": " + str(e))
+            return
+
+        path = self._get_path(self.get_key(url, seed))
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            # Videos may be loaded by several threads or processes
+            fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("Unable to write video cache entry: " + str(e))
+
+    def get_cached_videos(self, urls, seed):
+        """Returns the videos of urls if they are all cached, or None"""
+
+        videos = []
+        for url in urls:
+            video = self.get(url, seed)
+            if video is None:
+                return None
+            videos.append(video)
+        return videos
+
+    def get_videos(self, urls, seed):
+        """Same as sentence_mixer.get_videos, loading the cached videos
+        instead of parsing them.
+        Sentence mixing processes a video set as a whole, so it is called with
+        every url as soon as one of them is missing, one call at a time.
+        """
+
+        self._sm_lock.lock()
+        try:
+            videos = self.get_cached_videos(urls, seed)
+            if videos is None:
+                videos = sm.sentence_mixer.get_videos(urls, seed)
+                for video in videos:
+                    self.put(video.url, seed, video)
+            else:
+                self._prepare_randomizer(videos, seed)
+        finally:
+            self._sm_lock.unlock()
+        return videos
+
+    def _prepare_randomizer(self, videos, seed):
+        # Same state as after sentence_mixer.get_videos: the randomizer of
+        # the video set is created from the seed, then advanced by the
+        # shuffle of the audio phonems
+        sm.sentence_mixer.SEED = seed
+        sm.sentence_mixer.get_global_randomizer([v.url for v in videos])
+        audioDataFactory(videos).get_transcription_dict_audio_phonem()
+
+    def prepare_randomizer(self, videos, seed):
+        """Prepares the sentence mixing randomizer of videos, which may have
+        been loaded from the cache or with other videos, so that process_sm
+        finds the same combos for the same video set and seed.
+        Does nothing to a randomizer prepared before.
+        """
+
+        self._sm_lock.lock()
+        try:
+            self._prepare_randomizer(videos, seed)
+        finally:
+            self._sm_lock.unlock()
+
+    def clear(self):
+        if not os.path.isdir(self.folder):
+            return
+        for name in os.listdir(self.folder):
+            if name.endswith(EXTENSION):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+
+
+video_cache = VideoCache()
@@ -0,0 +1,121 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, unquote, urlparse
+
+from sentence_mixing.video_creator.download import dl_video
+
+from data_model.video_cache import video_cache
+
+# Number of videos fetched at the same time
+MAX_DOWNLOADS = 4
+
+
+def get_mirror_name(url):
+    """Name, without extension, of the file of a video in a mirror"""
+    return quote(url, safe="")
+
+
+def place_video(video, path):
+    """Sets the extension of the video fetched at path. The file is copied
+    next to the video base path if it is not already there.
+    """
+
+    n = len(video._base_path)
+    if path[:n] == video._base_path:
+        video.extension = path[n + 1 :]
+        return
+
+    extension = os.path.splitext(path)[1]
+    target = video._base_path + extension
+    if not os.path.exists(target):
+        tmp_path = target + ".tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+    video.extension = extension[1:]
+
+
+class DownloadFetcher:
+    """Downloads videos from their url"""
+
+    def fetch(self, url):
+        return dl_video(url)
+
+
+class MirrorFetcher:
+    """Fetches videos from a local directory, or a file:// url, holding a
+    file named get_mirror_name(url) for each video. Videos missing from the
+    mirror are fetched by fallback.
+    """
+
+    def __init__(self, root, fallback=None):
+        if root.startswith("file://"):
+            root = unquote(urlparse(root).path)
+        self.root = root
+        self.fallback = fallback
+
+    def get_path(self, url):
+        name = get_mirror_name(url)
+        for file_name in os.listdir(self.root):
+            if os.path.splitext(file_name)[0] == name:
+                return os.path.join(self.root, file_name)
+        return None
+
+    def fetch(self, url):
+        path = self.get_path(url)
+        if path is not None:
+            return path
+        if self.fallback is None:
+            raise EnvironmentError(f"{url} is not in the mirror {self.root}")
+        return self.fallback.fetch(url)
+
+
+class VideoDownloader:
+    """Fetches the videos of a project in a bounded thread pool"""
+
+    def __init__(self, fetcher=None, max_downloads=MAX_DOWNLOADS):
+        self.fetcher = fetcher if fetcher is not None else DownloadFetcher()
+        self.max_downloads = max_downloads
+
+    def set_fetcher(self, fetcher):
+        self.fetcher = fetcher
+
+    def set_max_downloads(self, max_downloads):
+        self.max_downloads = max_downloads
+
+    def download(self, urls, seed, video_callback=None):
+        """Returns the videos of urls. video_callback is called with each
+        video as soon as it is loaded.
+
+        Only the files are fetched concurrently. When every video is cached,
+        each one is ready as soon as its file is fetched. Otherwise sentence
+        mixing loads them all at once after the fetches.
+        """
+
+        videos = video_cache.get_cached_videos(urls, seed)
+        if videos is not None:
+            videos = dict(zip(urls, videos))
+
+        paths = {}
+        with ThreadPoolExecutor(self.max_downloads) as executor:
+            futures = {
+                executor.submit(self.fetcher.fetch, url): url for url in urls
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                paths[url] = future.result()
+                if videos is not None:
+                    place_video(videos[url], paths[url])
+                    if video_callback is not None:
+                        video_callback(videos[url])
+
+        if videos is None:
+            videos = dict(zip(urls, video_cache.get_videos(urls, seed)))
+            for url in urls:
+                place_video(videos[url], paths[url])
+                if video_callback is not None:
+                    video_callback(videos[url])
+        return [videos[url] for url in urls]
+
+
+downloader = VideoDownloader()
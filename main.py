@@ -5,8 +5,34 @@ import sys
 import sentence_mixing as sm
 from PySide2.QtWidgets import QApplication
 
+from analysis_engine import analysis_engine
+from data_model.analysis_cache import analysis_cache
+from data_model.video_cache import video_cache
+from downloader import DownloadFetcher, MirrorFetcher, downloader
+from view.audio_cache import audio_cache
+from view.frame_cache import frame_cache
 from view.MainWindow import MainWindow, load_project
 
+# Settings of config.json the sentence mixing results depend on
+SM_CONFIG_KEYS = (
+    "align_exe",
+    "g2p_exe",
+    "dict_path",
+    "dict_consonant_vowel_path",
+    "trained_model",
+    "lang",
+    "stt_model_path",
+    "stt_full_dict_path",
+)
+
+
+def get_sm_config(config):
+    """Returns the part of config the analyses and the videos depend on"""
+
+    sm_config = {key: config[key] for key in SM_CONFIG_KEYS if key in config}
+    sm_config["NODES"] = sm.logic.parameters.NODES
+    return sm_config
+
 
 if __name__ == "__main__":
     app = QApplication([])
@@ -19,6 +45,32 @@ if __name__ == "__main__":
 
     sm.sentence_mixer.prepare_sm_config_dict(config)
 
+    if "ANALYSIS_CACHE_FOLDER" in config:
+        analysis_cache.set_folder(config["ANALYSIS_CACHE_FOLDER"])
+    if "ANALYSIS_CACHE_SIZE" in config:
+        analysis_cache.set_max_size(config["ANALYSIS_CACHE_SIZE"])
+    analysis_cache.set_config(get_sm_config(config))
+
+    if "VIDEO_CACHE_FOLDER" in config:
+        video_cache.set_folder(config["VIDEO_CACHE_FOLDER"])
+    video_cache.set_config(get_sm_config(config))
+
+    if "ANALYSIS_PROCESSES" in config:
+        analysis_engine.set_max_workers(config["ANALYSIS_PROCESSES"])
+    analysis_engine.set_config(config, sm.logic.parameters.NODES)
+
+    if "DOWNLOAD_THREADS" in config:
+        downloader.set_max_downloads(config["DOWNLOAD_THREADS"])
+    if "VIDEO_MIRROR" in config:
+        downloader.set_fetcher(
+            MirrorFetcher(config["VIDEO_MIRROR"], DownloadFetcher())
+        )
+
+    if "PREVIEW_CACHE_SIZE" in config:
+        frame_cache.set_max_bytes(config["PREVIEW_CACHE_SIZE"])
+    if "PREVIEW_AUDIO_CACHE_SIZE" in config:
+        audio_cache.set_max_bytes(config["PREVIEW_AUDIO_CACHE_SIZE"])
+
     window = None
     if len(sys.argv) > 1:
         window = MainWindow(load_project(sys.argv[1]))
@@ -27,4 +79,6 @@ if __name__ == "__main__":
     if window is not None:
         window.show()
 
-    sys.exit(app.exec_())
+    ret = app.exec_()
+    analysis_engine.shutdown()
+    sys.exit(ret)
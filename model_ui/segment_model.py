@@ -25,14 +25,20 @@ class Columns(Enum):
 
 
 class ChosenCombo:
+    # One per table row: no instance dict
+    __slots__ = ("project", "sentence", "index")
+
     def __init__(self, project, sentence="", index=0):
         self.project = project
         self.sentence = sentence
         self.index = index
 
     def is_ready(self):
+        segment = self.get_associated_segment()
         return (
-            not self.get_associated_segment().need_analysis()
+            self.project.has_videos()
+            and not segment.need_analysis()
+            and not segment.is_waiting_for_videos()
             and self.sentence != ""
         )
 
@@ -79,7 +85,7 @@ class SegmentModel(QtCore.QAbstractTableModel):
     def __init__(self, project, *args, **kwargs):
         QtCore.QAbstractTableModel.__init__(self, *args, **kwargs)
         self.project = project
-        self.command_stack = QtWidgets.QUndoStack()
+        self.command_stack = view.commands.JournaledUndoStack()
 
     def get_segment_from_index(self, index):
         return self.get_chosen_from_index(index).get_associated_segment()
@@ -168,6 +174,14 @@ class SegmentModel(QtCore.QAbstractTableModel):
         self.endInsertRows()
         return True
 
+    def reset_ordered_segments(self, serialized_ordered_segments):
+        self.beginResetModel()
+        self.project.ordered_segments = [
+            ChosenCombo.from_JSON_serializable(self.project, c)
+            for c in serialized_ordered_segments
+        ]
+        self.endResetModel()
+
     def is_empty(self):
         return len(self.project.ordered_segments) == 0
 
@@ -208,12 +222,23 @@ class SegmentModel(QtCore.QAbstractTableModel):
         analysis (which is for the moment unused).
         """
 
+        self._trigger_sentence_data_changed(sentence, [QtCore.Qt.EditRole])
+
+    @QtCore.Slot()
+    def analysis_progressed(self, sentence):
+        """Triggered when an analysis appended combos to its segment.
+        Edit role is not used, since the sentence itself did not change.
+        """
+
+        self._trigger_sentence_data_changed(
+            sentence, [QtCore.Qt.DisplayRole, QtCore.Qt.DecorationRole]
+        )
+
+    def _trigger_sentence_data_changed(self, sentence, roles):
         def trigger_data_changed(column):
             topleft = self.index(i, column.value)
             bottomright = self.index(i, column.value)
-            self.dataChanged.emit(
-                topleft, bottomright, [QtCore.Qt.EditRole]
-            )
+            self.dataChanged.emit(topleft, bottomright, roles)
 
         for i, chosen_segment in enumerate(self.project.ordered_segments):
             if chosen_segment.sentence == sentence:
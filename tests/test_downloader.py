@@ -0,0 +1,91 @@
+import pytest
+
+from benchmarks.synthetic import Node
+
+# The downloader needs PySide2 and sentence mixing
+downloader = pytest.importorskip("downloader")
+get_mirror_name = downloader.get_mirror_name
+place_video = downloader.place_video
+MirrorFetcher = downloader.MirrorFetcher
+
+URL = "https://www.youtube.com/watch?v=_ZZ8oyZUGn8"
+
+
+class ListFetcher:
+    def __init__(self):
+        self.urls = []
+
+    def fetch(self, url):
+        self.urls.append(url)
+        return "downloaded"
+
+
+def make_mirror(root, url=URL, extension=".mp4"):
+    root.mkdir(exist_ok=True)
+    path = root / (get_mirror_name(url) + extension)
+    path.write_bytes(b"video")
+    return path
+
+
+def test_mirror_names_are_file_names():
+    name = get_mirror_name(URL)
+    assert "/" not in name and ":" not in name and "?" not in name
+    assert get_mirror_name(URL + "&t=1") != name
+
+
+def test_mirror_finds_videos_whatever_their_extension(tmp_path):
+    path = make_mirror(tmp_path, extension=".webm")
+    fetcher = MirrorFetcher(str(tmp_path))
+    assert fetcher.get_path(URL) == str(path)
+    assert fetcher.fetch(URL) == str(path)
+    assert fetcher.get_path(URL + "&t=1") is None
+
+
+def test_mirror_accepts_file_urls(tmp_path):
+    root = tmp_path / "video mirror"
+    path = make_mirror(root)
+    fetcher = MirrorFetcher(root.as_uri())
+    assert fetcher.root == str(root)
+    assert fetcher.fetch(URL) == str(path)
+
+
+def test_mirror_falls_back_for_missing_videos(tmp_path):
+    make_mirror(tmp_path)
+    fallback = ListFetcher()
+    fetcher = MirrorFetcher(str(tmp_path), fallback)
+    other_url = URL + "&t=1"
+
+    assert fetcher.fetch(URL) != "downloaded"
+    assert fetcher.fetch(other_url) == "downloaded"
+    assert fallback.urls == [other_url]
+
+    with pytest.raises(EnvironmentError):
+        MirrorFetcher(str(tmp_path)).fetch(other_url)
+
+
+def test_place_video_keeps_downloaded_files(tmp_path):
+    base_path = str(tmp_path / "id.title")
+    path = tmp_path / "id.title.mkv"
+    path.write_bytes(b"video")
+    video = Node(_base_path=base_path, extension=None)
+
+    place_video(video, str(path))
+    assert video.extension == "mkv"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["id.title.mkv"]
+
+
+def test_place_video_copies_mirrored_files(tmp_path):
+    mirrored = make_mirror(tmp_path / "mirror")
+    base_path = str(tmp_path / "id.title")
+    video = Node(_base_path=base_path, extension=None)
+
+    place_video(video, str(mirrored))
+    assert video.extension == "mp4"
+    with open(base_path + ".mp4", "rb") as f:
+        assert f.read() == b"video"
+
+    # Files already placed are not copied again
+    mirrored.write_bytes(b"other")
+    place_video(video, str(mirrored))
+    with open(base_path + ".mp4", "rb") as f:
+        assert f.read() == b"video"
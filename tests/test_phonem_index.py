@@ -0,0 +1,87 @@
+import itertools
+import random
+
+from benchmarks.synthetic import make_video
+from data_model.phonem_index import PhonemIndex, PhonemsKey
+
+
+def make_small_video(url, n_words=3):
+    return make_video(url, n_sentences=3, n_words=n_words, n_phonems=3)
+
+
+def get_project_indexes(phonems):
+    """Project indexes of the phonems, found by scanning their video"""
+    return tuple(
+        (
+            ph.word.sentence.video.url,
+            ph.word.sentence.video.subtitles.index(ph.word.sentence),
+            ph.word.sentence.words.index(ph.word),
+            ph.word.phonems.index(ph),
+        )
+        for ph in phonems
+    )
+
+
+def hash_phonems(phonems):
+    """Former preview cache key"""
+    return sum(hash(str(p.start) + p.word.sentence.video.url) for p in phonems)
+
+
+def get_key(phonems, index):
+    return PhonemsKey(
+        [index.get_id_of_phonem(ph) for ph in phonems], index.namespace
+    )
+
+
+def test_keys_match_project_indexes():
+    videos = [make_small_video("a"), make_small_video("b")]
+    index = PhonemIndex(videos)
+    rng = random.Random(0)
+    sequences = [
+        rng.sample(index.phonems, rng.randint(1, 4)) for _ in range(200)
+    ]
+    # Same phonems in both indexes, as in another project
+    sequences += [list(s) for s in sequences[:20]]
+
+    for s1, s2 in itertools.combinations(sequences, 2):
+        same_phonems = get_project_indexes(s1) == get_project_indexes(s2)
+        k1, k2 = get_key(s1, index), get_key(s2, index)
+        assert (k1 == k2) == same_phonems
+        if same_phonems:
+            assert hash(k1) == hash(k2)
+
+
+def test_reordered_phonems_do_not_collide():
+    index = PhonemIndex([make_small_video("a"), make_small_video("b")])
+    phonems = index.phonems[:3] + index.phonems[-2:]
+    rng = random.Random(0)
+
+    for _ in range(20):
+        reordered = rng.sample(phonems, len(phonems))
+        if reordered == phonems:
+            continue
+        # The former key is a sum over the phonems: the order is lost
+        assert hash_phonems(reordered) == hash_phonems(phonems)
+        assert get_key(reordered, index) != get_key(phonems, index)
+
+
+def test_keys_of_different_projects_do_not_collide():
+    # Both projects have phonem ids starting at 0, for different videos
+    first = PhonemIndex([make_small_video("a")])
+    second = PhonemIndex([make_small_video("b")])
+
+    for i in range(len(first)):
+        ph1, ph2 = first.phonems[i], second.phonems[i]
+        assert first.get_id_of_phonem(ph1) == second.get_id_of_phonem(ph2)
+        assert get_project_indexes([ph1]) != get_project_indexes([ph2])
+        assert get_key([ph1], first) != get_key([ph2], second)
+
+
+def test_project_indexes_round_trip():
+    index = PhonemIndex(
+        [make_small_video("a"), make_small_video("b", n_words=2)]
+    )
+    for phonem_id, ph in enumerate(index.phonems):
+        project_index = index.get_project_index(ph)
+        assert project_index == get_project_indexes([ph])[0]
+        assert index.get_phonem_id(project_index) == phonem_id
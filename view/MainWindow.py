@@ -8,29 +8,23 @@ from sentence_mixing.video_creator.video import create_video_file
 
 import view.commands as commands
 import view.video_assembly as video_assembly
+from data_model.journal import ProjectJournal, get_journal_path
 from data_model.project import Project, load_project
+from downloader import downloader
 from model_ui.segment_model import SegmentModel, Columns
 from ui.generated.ui_mainwindow import Ui_Sentence
 from view import preview
+from view.audio_cache import audio_cache
 from view.NewProjectDialog import NewProjectDialog
+from view.proxy import proxy_store
 from worker import AnalyzeWorker, AnalyzeWorkerPool, Worker, WorkerSignals
 
-from sentence_mixing.video_creator.download import dl_video
 
-import sentence_mixing as sm
 from worker import Worker
 
+# Number of videos whose proxy and audio track are created at the same time
+PREVIEW_SOURCE_THREADS = 2
 
-def download_video_and_audio(urls, seed):
-    vid_paths = list(map(dl_video, urls))
-    videos = sm.sentence_mixer.get_videos(urls, seed)
-
-    for video, path in zip(videos, vid_paths):
-        n = len(video._base_path)
-        assert path[:n] == video._base_path
-        video.extension = path[n + 1 :]
-
-    return videos
 
 class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
     def __init__(self, project):
@@ -64,6 +58,11 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         self.pixmap = QtWidgets.QGraphicsPixmapItem()
         self.graphicsView.scene().addItem(self.pixmap)
 
+        self.journal = None
+        self.proxy_workers = []
+        # Kept apart from the analyses, which share self.threadpool
+        self.preview_sources_pool = QtCore.QThreadPool()
+        self.preview_sources_pool.setMaxThreadCount(PREVIEW_SOURCE_THREADS)
         self.open_project(project)
 
         self.actionUndo.triggered.connect(
@@ -109,6 +108,9 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         self.analyze_worker_pool = AnalyzeWorkerPool(
             self.segment_model, self.threadpool
         )
+        self.tableView.verticalScrollBar().valueChanged.connect(
+            self.update_analysis_priorities
+        )
 
         self.show_warning_message = True
 
@@ -121,14 +123,36 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
 
         self.project = project
 
-        self.video_dl_worker = Worker(download_video_and_audio, project.urls[0], project.seed)
-
-        def init(videos):
-            project.init_project(videos)
-            for s in project.segments.values():
-                self.segment_text_changed(s)
+        for worker in self.proxy_workers:
+            worker.interrupt()
+        self.proxy_workers = []
 
-        self.video_dl_worker.signals.result.connect(init)
+        self.video_dl_worker = Worker(
+            downloader.download, project.urls[0], project.seed
+        )
+        self.video_dl_worker.kwargs[
+            "video_callback"
+        ] = self.video_dl_worker.signals.partial_result.emit
+
+        def video_downloaded(video):
+            project.add_video(video)
+
+            # Previews decode the source video until its proxy and its audio
+            # track are ready
+            def create_preview_sources(interruption_callback):
+                audio_cache.create_track(video, interruption_callback)
+                proxy_store.create(video, interruption_callback)
+
+            worker = Worker(create_preview_sources)
+            worker.kwargs[
+                "interruption_callback"
+            ] = worker.should_be_interrupted
+            worker.signals.error.connect(print)
+            self.proxy_workers.append(worker)
+            self.preview_sources_pool.start(worker)
+
+        project.signals.videoReady.connect(self.video_ready)
+        self.video_dl_worker.signals.partial_result.connect(video_downloaded)
         self.video_dl_worker.signals.error.connect(print)
 
         self.threadpool.start(self.video_dl_worker)
@@ -136,6 +160,57 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         self.segment_model = SegmentModel(project)
         self.tableView.setModel(self.segment_model)
 
+        self.open_journal()
+
+    def open_journal(self):
+        """Recovers the changes journaled since the last save of the project,
+        then journals the new ones
+        """
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+        if self.project.path is None:
+            return
+
+        journal = ProjectJournal(get_journal_path(self.project.path))
+        if journal.exists():
+            ret = QtWidgets.QMessageBox.question(
+                self,
+                self.tr("Recover project"),
+                self.tr(
+                    "Unsaved changes of this project have been found.\nDo you want to recover them?"
+                ),
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+                QtWidgets.QMessageBox.Yes,
+            )
+            if ret == QtWidgets.QMessageBox.Yes:
+                commands.replay_journal(
+                    self.segment_model, self.tableView, journal.read_records()
+                )
+                self.segment_model.command_stack.resetClean()
+                self.setWindowModified(True)
+            else:
+                journal.remove()
+
+        self.start_journal(journal)
+
+    def start_journal(self, journal):
+        self.journal = journal
+        self.segment_model.command_stack.set_journal(
+            journal, self.get_journal_snapshot
+        )
+
+    def get_journal_snapshot(self):
+        return [
+            c.to_JSON_serializable() for c in self.project.ordered_segments
+        ]
+
+    def discard_journal(self):
+        if self.journal is not None:
+            self.journal.remove()
+
     @QtCore.Slot()
     def stackCleanChanged(self, is_clean):
         self.setWindowModified(not is_clean)
@@ -191,7 +266,30 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         if self.previewer is not None and current.row() != _previous.row():
             self.previewer.stop()
 
+    def update_analysis_priorities(self, *_):
+        """Analyses of the selected and visible segments are launched first"""
+
+        first_row = self.tableView.rowAt(0)
+        last_row = self.tableView.rowAt(self.tableView.viewport().height() - 1)
+        if last_row == -1:
+            last_row = self.segment_model.rowCount(self) - 1
+
+        visible_segments = []
+        if first_row != -1:
+            visible_segments = [
+                self.segment_model.get_chosen_from_row(
+                    row
+                ).get_associated_segment()
+                for row in range(first_row, last_row + 1)
+            ]
+
+        self.analyze_worker_pool.scheduler.set_priorities(
+            self.get_all_selected_segments(), visible_segments
+        )
+
     def selection_change(self, newly_selected, newly_deselected):
+        self.update_analysis_priorities()
+
         selected_segments = self.get_all_selected_segments()
 
         if len(selected_segments) == 0:
@@ -262,50 +360,90 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
             if segment.is_analyzed():
                 self.preview_combo(combo_index)
 
+    def video_ready(self, url):
+        """Launches the analyses which can use the new video"""
+
+        self.update_analysis_priorities()
+        # Segments restored from the project file are already analyzed
+        for s in list(self.project.segments.values()):
+            self.segment_text_changed(s)
+
     def segment_text_changed(self, segment):
         def compute_finish():
-            pass
+            # Analyses made before every video is added are made again, once
+            # the worker is released
+            def refine():
+                if (
+                    self.project.segments.get(segment.get_sentence())
+                    is segment
+                ):
+                    self.segment_text_changed(segment)
+
+            if segment.need_refinement():
+                QtCore.QTimer.singleShot(0, refine)
 
         def compute_success(_):
-            preview.previewManager.compute_previews(
-                self.threadpool, segment.combos[:10]
-            )
+            preview.previewManager.compute_previews(segment.combos[:10])
 
         def compute_error(err):
             self.pop_error_box(err)
 
-        already_created = False
-        try:
-            self.analyze_worker_pool.add_worker(
-                segment, compute_finish, compute_success, compute_error
-            )
-        except KeyError:
-            already_created = True
+        first_combos = True
+
+        def compute_progress(_):
+            # The first combo is previewed while the analysis goes on
+            nonlocal first_combos
+            if not first_combos:
+                return
+            first_combos = False
+
+            if self.get_first_selected_segment() is segment:
+                index = self.get_first_selected_index()
+                i = self.segment_model.get_chosen_from_index(
+                    index
+                ).get_chosen_combo_index()
+                if i < len(segment.combos):
+                    self.preview_combo(i)
+                    return
+            preview.previewManager.compute_previews(segment.combos[:1])
+
+        need_analysis = segment.need_analysis() or segment.need_refinement()
+
+        # Previously analyzed sentences do not need an analysis worker
+        if (
+            self.project.has_videos()
+            and need_analysis
+            and segment not in self.analyze_worker_pool
+            and segment.load_from_cache()
+        ):
+            self.segment_model.analysis_state_changed(segment.get_sentence())
+            compute_success(None)
+            return
 
-        # If videos are still downloading
-        if not self.project.are_videos_ready():
+        # If no video is downloaded yet
+        if not self.project.has_videos():
             self.pop_warning_box(
                 "Les vidéos sont en cours de téléchargement. L'analyse du segment débutera automatiquement."
             )
-
-            # Lanches the analysis at the end of the downloading if necessary
-            if not already_created:
-
-                def exec_worker():
-                    self.analyze_worker_pool.launch_thread(segment)
-
-                self.video_dl_worker.signals.finished.connect(exec_worker)
+            # The analysis is launched by video_ready
             return
 
-        if not segment.need_analysis():
+        if not need_analysis or segment in self.analyze_worker_pool:
             return
 
+        self.analyze_worker_pool.add_worker(
+            segment,
+            compute_finish,
+            compute_success,
+            compute_error,
+            compute_progress,
+        )
+
         if self.previewer is not None:
             self.previewer.stop()
         preview.previewManager.cancel(segment)
 
-        if not already_created:
-            self.analyze_worker_pool.launch_thread(segment)
+        self.analyze_worker_pool.launch_thread(segment)
 
     def get_all_selected_indexes(self):
         # Warning: returns only one index per row
@@ -342,8 +480,8 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
 
     @QtCore.Slot()
     def complete_preview(self, *_, chosen=None):
-        phonems = self.collect_combos(chosen_list=chosen, strict=False)
-        previewer = preview.Previewer(None, audio_phonems=phonems)
+        combos = self.collect_chosen_combos(chosen_list=chosen, strict=False)
+        previewer = preview.TimelinePlayer(combos)
         if self.previewer is not None:
             self.previewer.stop()
         self.previewer = previewer
@@ -361,7 +499,9 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
             return
 
         if previewer is not None and (
-            previewer.combo is None or current_combo == previewer.combo
+            previewer.combo is None
+            or preview.get_preview_key(current_combo)
+            == preview.get_preview_key(previewer.combo)
         ):
             if self.previewer is not None:
                 self.previewer.stop()
@@ -376,10 +516,12 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         segment = self.get_first_selected_segment()
         if segment is not None:
             preview.previewManager.compute_previews(
-                self.threadpool, segment.combos[i : i + 1], self._preview_combo
+                segment.combos[i : i + 1],
+                self._preview_combo,
+                preview.SELECTED_PRIORITY,
             )
             preview.previewManager.compute_previews(
-                self.threadpool, segment.combos[i + 1 : i + 6]
+                segment.combos[i + 1 : i + 6]
             )
             self._preview_combo(preview.blank_preview)
 
@@ -440,7 +582,6 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         )
         try:
             self.open_project(load_project(path))
-            self.segment_model.command_stack.setClean()
         except EnvironmentError as e:
             QtWidgets.QMessageBox.information(
                 self, self.tr("Unable to open file"), e.args[0]
@@ -456,6 +597,8 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         try:
             self.project.save()
             self.segment_model.command_stack.setClean()
+            # The journal only holds the changes made since the last save
+            self.discard_journal()
         except EnvironmentError as e:
             QtWidgets.QMessageBox.information(
                 self, self.tr("Unable to open file"), e.args[0],
@@ -470,29 +613,45 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
         )
         print(path)
         if path != "":
+            self.discard_journal()
             self.project.set_path(path)
+            self.start_journal(
+                ProjectJournal(get_journal_path(self.project.path))
+            )
             self._save()
 
     def collect_combos(self, chosen_list=None, strict=True):
+        phonems = []
+        for combo in self.collect_chosen_combos(chosen_list, strict):
+            phonems.extend(combo.get_audio_phonems())
+        return phonems
+
+    def collect_chosen_combos(self, chosen_list=None, strict=True):
         if chosen_list is None:
             chosen_list = self.segment_model.get_ordered_segments()
 
         if strict and self.segment_model.is_empty():
             raise Exception("No segment found")
 
-        phonems = []
+        # Segments still to analyze are needed first by the next attempt
+        self.analyze_worker_pool.scheduler.set_needed(
+            ordered_segment.get_associated_segment()
+            for ordered_segment in chosen_list
+            if not ordered_segment.is_ready()
+        )
+
+        combos = []
         for ordered_segment in chosen_list:
             if not ordered_segment.is_ready():
                 if strict:
                     raise Exception("A segment have not been analyzed")
             else:
-                combo = ordered_segment.get_chosen_combo()
-                phonems.extend(combo.get_audio_phonems())
+                combos.append(ordered_segment.get_chosen_combo())
 
-        if len(phonems) == 0:
+        if len(combos) == 0:
             raise Exception("No analyzed segments")
 
-        return phonems
+        return combos
 
     def export_selection(self):
         selected_rows = {
@@ -570,9 +729,11 @@ class MainWindow(Ui_Sentence, QtWidgets.QMainWindow):
             if ret == QtWidgets.QMessageBox.Save:
                 self.save()
             elif ret == QtWidgets.QMessageBox.Discard:
-                pass
+                self.discard_journal()
             elif ret == QtWidgets.QMessageBox.Cancel:
                 return False
+        if not self.isWindowModified():
+            self.discard_journal()
         return True
 
     def quit(self):
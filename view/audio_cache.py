@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+from moviepy.audio.io.AudioFileClip import AudioFileClip
+from PySide2 import QtCore
+from sentence_mixing.video_creator.audio import concat_segments
+
+from view.frame_cache import FrameCache
+from view.proxy import get_video_path
+
+# Sample rate of the decoded tracks, also used by previews
+AUDIO_RATE = 44100
+TRACK_EXTENSION = f".pcm{AUDIO_RATE}.npy"
+
+# Number of samples decoded at once when writing a track
+DECODE_CHUNK_SIZE = 2 ** 16
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def get_track_path(video):
+    return video._base_path + TRACK_EXTENSION
+
+
+def write_track(video_path, track_path, interruption_callback=None):
+    """Decodes the audio of the video once and writes it in a npy file, as
+    int16 samples of shape (samples, channels) at AUDIO_RATE
+    """
+
+    clip = AudioFileClip(video_path, fps=AUDIO_RATE)
+    try:
+        n_samples = int(clip.duration * AUDIO_RATE)
+        tmp_path = track_path + ".tmp"
+        track = np.lib.format.open_memmap(
+            tmp_path,
+            mode="w+",
+            dtype=np.int16,
+            shape=(n_samples, clip.nchannels),
+        )
+        i = 0
+        for chunk in clip.iter_chunks(
+            chunksize=DECODE_CHUNK_SIZE,
+            fps=AUDIO_RATE,
+            quantize=True,
+            nbytes=2,
+        ):
+            if interruption_callback is not None and interruption_callback():
+                del track
+                os.remove(tmp_path)
+                return
+            chunk = chunk.reshape((len(chunk), -1))[: n_samples - i]
+            track[i : i + len(chunk)] = chunk
+            i += len(chunk)
+        track.flush()
+        del track
+        os.replace(tmp_path, track_path)
+    finally:
+        clip.close()
+
+
+class AudioCache:
+    """Waveforms of phonems and combos, for previews.
+
+    The audio track of each source video is decoded once in a npy file and
+    memory-mapped: the waveform of a phonem is a slice of its track, without
+    any copy. Waveforms of combos are concatenations of phonem slices, kept
+    in a LRU cache with a byte budget.
+    Phonems whose track is not ready yet are handled by concat_segments.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._tracks = {}
+        self._lock = QtCore.QReadWriteLock()
+
+        self.waves = FrameCache(max_bytes)
+        self.fallbacks = 0
+
+    def get_track(self, url):
+        """Returns the decoded track of the video, or None if it is not
+        ready
+        """
+
+        self._lock.lockForRead()
+        track = self._tracks.get(url)
+        self._lock.unlock()
+        return track
+
+    def create_track(self, video, interruption_callback=None):
+        """Writes the track of the video if needed, and loads it"""
+
+        if self.get_track(video.url) is not None:
+            return
+
+        video_path = get_video_path(video)
+        track_path = get_track_path(video)
+        if not os.path.exists(track_path) or os.path.getmtime(
+            track_path
+        ) < os.path.getmtime(video_path):
+            write_track(video_path, track_path, interruption_callback)
+            if not os.path.exists(track_path):
+                return
+
+        track = np.load(track_path, mmap_mode="r")
+
+        self._lock.lockForWrite()
+        self._tracks[video.url] = track
+        self._lock.unlock()
+
+    def get_phonem_wave(self, p):
+        """Returns the waveform of the phonem as a view of its track, or None
+        if the track is not ready
+        """
+
+        track = self.get_track(p.word.sentence.video.url)
+        if track is None:
+            return None
+        start = min(len(track), max(0, int(round(p.start * AUDIO_RATE))))
+        end = min(len(track), max(start, int(round(p.end * AUDIO_RATE))))
+        return track[start:end]
+
+    def get_wave(self, phonems, phonems_key=None):
+        """Returns the (rate, waveform) of the concatenated phonems.
+        phonems_key (see PhonemsKey) identifies phonems in the cache.
+        """
+
+        key = ("wave", phonems_key)
+        if phonems_key is not None:
+            try:
+                return AUDIO_RATE, self.waves.get(key)
+            except KeyError:
+                pass
+
+        waves = [self.get_phonem_wave(p) for p in phonems]
+        if (
+            any(w is None for w in waves)
+            or len(set(w.shape[1] for w in waves)) > 1
+        ):
+            self._lock.lockForWrite()
+            self.fallbacks += 1
+            self._lock.unlock()
+            return concat_segments(phonems)
+
+        if len(waves) == 0:
+            wave = np.zeros((0, 1), dtype=np.int16)
+        else:
+            wave = np.concatenate(waves)
+        if phonems_key is not None:
+            self.waves.put(key, wave)
+        return AUDIO_RATE, wave
+
+    def set_max_bytes(self, max_bytes):
+        self.waves.set_max_bytes(max_bytes)
+
+    def get_stats(self):
+        stats = self.waves.get_stats()
+        self._lock.lockForRead()
+        stats["tracks"] = len(self._tracks)
+        stats["fallbacks"] = self.fallbacks
+        self._lock.unlock()
+        return stats
+
+
+audio_cache = AudioCache()
@@ -4,6 +4,9 @@ from PySide2 import QtCore, QtWidgets
 
 import model_ui.segment_model as segm
 
+# Number of journal records after which the journal is compacted
+JOURNAL_COMPACTION_INTERVAL = 500
+
 
 class CommandIds(Enum):
     edit = 0
@@ -21,6 +24,13 @@ class AddSegmentCommand(QtWidgets.QUndoCommand):
         self.previous_selected_row = previous_selected_row
         self.new_row = new_row
 
+    def to_JSON_serializable(self):
+        return {
+            "type": "add",
+            "previous_selected_row": self.previous_selected_row,
+            "new_row": self.new_row,
+        }
+
     def undo(self):
         self.segment_model.removeRow(self.new_row)
         index = self.segment_model.createIndex(self.previous_selected_row, 0)
@@ -49,6 +59,16 @@ class EditSegmentCommand(QtWidgets.QUndoCommand):
         self.new_value = new_value
         self.role = role
 
+    def to_JSON_serializable(self):
+        return {
+            "type": "edit",
+            "row": self.index.row(),
+            "column": self.index.column(),
+            "old_value": self.old_value,
+            "new_value": self.new_value,
+            "role": int(self.role),
+        }
+
     def undo(self):
         self.segment_model._set_attribute_from_index(
             self.index, self.old_value
@@ -95,6 +115,12 @@ class GroupedCommand(QtWidgets.QUndoCommand):
         self.commands = commands
         QtWidgets.QUndoCommand.__init__(self, f"prout")
 
+    def to_JSON_serializable(self):
+        return {
+            "type": "grouped",
+            "commands": [c.to_JSON_serializable() for c in self.commands],
+        }
+
     def undo(self):
         for command in reversed(self.commands):
             command.undo()
@@ -113,6 +139,14 @@ class RemoveSegmentCommand(QtWidgets.QUndoCommand):
         self.sentence = None
         self.combo_index = None
 
+    def to_JSON_serializable(self):
+        return {
+            "type": "remove",
+            "row": self.row,
+            "sentence": self.sentence,
+            "combo_index": self.combo_index,
+        }
+
     def undo(self):
         self.segment_model.insertRow(self.row)
         sentence_index = self.segment_model.createIndex(
@@ -179,6 +213,15 @@ class DragDropCommand(QtWidgets.QUndoCommand):
                 if self.actions[j][1] > row:
                     self.actions[j][1] += 1 if insert else -1
 
+    def to_JSON_serializable(self):
+        return {
+            "type": "drag_drop",
+            "row_segments": [
+                (from_, to_, combo.to_JSON_serializable())
+                for from_, to_, combo in self.row_segments
+            ],
+        }
+
     def execute(self, invert):
         itera = reversed(self.actions) if invert else self.actions
         for insert, row, combo in itera:
@@ -204,3 +247,160 @@ class DragDropCommand(QtWidgets.QUndoCommand):
 
     def redo(self):
         self.execute(False)
+
+
+def command_from_JSON_serializable(segment_model, list_view, obj):
+    """Rebuilds a command serialized with its to_JSON_serializable method"""
+
+    type_ = obj["type"]
+    if type_ == "add":
+        return AddSegmentCommand(
+            segment_model,
+            list_view,
+            obj["previous_selected_row"],
+            obj["new_row"],
+        )
+    if type_ == "edit":
+        return EditSegmentCommand(
+            segment_model,
+            segment_model.index(obj["row"], obj["column"]),
+            obj["old_value"],
+            obj["new_value"],
+            QtCore.Qt.ItemDataRole(obj["role"]),
+        )
+    if type_ == "grouped":
+        return GroupedCommand(
+            [
+                command_from_JSON_serializable(segment_model, list_view, c)
+                for c in obj["commands"]
+            ]
+        )
+    if type_ == "remove":
+        command = RemoveSegmentCommand(segment_model, list_view, obj["row"])
+        command.sentence = obj["sentence"]
+        command.combo_index = obj["combo_index"]
+        return command
+    if type_ == "drag_drop":
+        return DragDropCommand(
+            segment_model,
+            [
+                (
+                    from_,
+                    to_,
+                    segm.ChosenCombo.from_JSON_serializable(
+                        segment_model.project, combo
+                    ),
+                )
+                for from_, to_, combo in obj["row_segments"]
+            ],
+        )
+    raise ValueError(f"Unknown command type {type_}")
+
+
+class JournaledUndoStack(QtWidgets.QUndoStack):
+    """Undo stack recording pushed, undone and redone commands in a project
+    journal.
+
+    Commands pushed while another command is executed (e.g. the edits of a
+    DragDropCommand) are not recorded: replaying the outer command pushes
+    them again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        QtWidgets.QUndoStack.__init__(self, *args, **kwargs)
+        self.journal = None
+        self.snapshot_callback = None
+        self._depth = 0
+
+    def set_journal(self, journal, snapshot_callback):
+        """snapshot_callback returns the serialized ordered segments written
+        when the journal is compacted
+        """
+
+        self.journal = journal
+        self.snapshot_callback = snapshot_callback
+
+    def _record(self, record):
+        if self.journal is None or self._depth > 1:
+            return
+        try:
+            self.journal.append(record)
+            if self.journal.record_count >= JOURNAL_COMPACTION_INTERVAL:
+                self.journal.compact(self.snapshot_callback())
+        except OSError as e:
+            print("Unable to write project journal: " + str(e))
+
+    def push(self, command):
+        self._depth += 1
+        try:
+            QtWidgets.QUndoStack.push(self, command)
+            self._record(
+                {"type": "push", "command": command.to_JSON_serializable()}
+            )
+        finally:
+            self._depth -= 1
+
+    def undo(self):
+        if not self.canUndo():
+            return
+        self._depth += 1
+        try:
+            command = self.command(self.index() - 1)
+            QtWidgets.QUndoStack.undo(self)
+            self._record(
+                {"type": "undo", "command": command.to_JSON_serializable()}
+            )
+        finally:
+            self._depth -= 1
+
+    def redo(self):
+        if not self.canRedo():
+            return
+        self._depth += 1
+        try:
+            command = self.command(self.index())
+            QtWidgets.QUndoStack.redo(self)
+            self._record(
+                {"type": "redo", "command": command.to_JSON_serializable()}
+            )
+        finally:
+            self._depth -= 1
+
+
+def replay_journal(segment_model, list_view, records):
+    """Replays journal records on a freshly loaded project.
+
+    Pushed commands go through the undo stack, so the undo history is
+    restored. Commands undone past a compaction are not in the stack anymore:
+    they are rebuilt from their record and undone (or redone) directly.
+    """
+
+    stack = segment_model.command_stack
+    detached = []
+    for record in records:
+        type_ = record["type"]
+        if type_ == "snapshot":
+            segment_model.reset_ordered_segments(record["snapshot"])
+            continue
+
+        if type_ == "push":
+            detached.clear()
+            stack.push(
+                command_from_JSON_serializable(
+                    segment_model, list_view, record["command"]
+                )
+            )
+        elif type_ == "undo":
+            if stack.canUndo():
+                stack.undo()
+            else:
+                command = command_from_JSON_serializable(
+                    segment_model, list_view, record["command"]
+                )
+                command.undo()
+                detached.append(command)
+        elif type_ == "redo":
+            if len(detached) > 0:
+                detached.pop().redo()
+            else:
+                stack.redo()
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+from PySide2 import QtCore
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def get_frames_size(frames):
+    """Returns the size in bytes of a frame array or of a list of frames"""
+    if hasattr(frames, "nbytes"):
+        return frames.nbytes
+    return sum(f.nbytes for f in frames)
+
+
+class FrameCache:
+    """Thread safe LRU cache of preview frames with a byte budget.
+
+    Keys must only hold plain values (urls, timestamps, indexes...), so that
+    the cache does not keep previewers or video objects alive.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = QtCore.QMutex()
+
+    def get(self, key):
+        """Raises KeyError if key is not in the cache"""
+
+        self._lock.lock()
+        try:
+            frames, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return frames
+        finally:
+            self._lock.unlock()
+
+    def put(self, key, frames):
+        size = get_frames_size(frames)
+
+        self._lock.lock()
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        # Frames larger than the whole budget are not cached
+        if size <= self.max_bytes:
+            self._entries[key] = (frames, size)
+            self.size += size
+            self._evict()
+        self._lock.unlock()
+
+    def set_max_bytes(self, max_bytes):
+        self._lock.lock()
+        self.max_bytes = max_bytes
+        self._evict()
+        self._lock.unlock()
+
+    def clear(self):
+        self._lock.lock()
+        self._entries.clear()
+        self.size = 0
+        self._lock.unlock()
+
+    def get_stats(self):
+        self._lock.lock()
+        stats = {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+        self._lock.unlock()
+        return stats
+
+    def _evict(self):
+        while self.size > self.max_bytes:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+import numpy as np
+from PySide2 import QtCore
+
+from view.frame_cache import frame_cache
+from view.proxy import DOWNSCALE, proxy_store
+
+
+def get_phonem_times(p, fps):
+    return np.arange(p.start, p.end, 1.0 / fps)
+
+
+def get_phonem_key(p, fps):
+    return ("phonem", p.word.sentence.video.url, p.start, p.end, fps)
+
+
+class FrameExtractor:
+    """Extracts the downscaled frames of phonems.
+
+    The timestamps of every phonem of a source video are merged and decoded
+    in increasing order, so the video reader goes through the source once
+    instead of seeking back and forth between phonems. Extracted phonem
+    frames are stored in the frame cache.
+    Videos having a proxy are not decoded at all: frames are views of the
+    proxy array.
+    """
+
+    def __init__(self):
+        # Video readers are not thread safe
+        self._locks = defaultdict(QtCore.QMutex)
+        self._locks_lock = QtCore.QMutex()
+
+    def _get_lock(self, url):
+        self._locks_lock.lock()
+        lock = self._locks[url]
+        self._locks_lock.unlock()
+        return lock
+
+    def extract_sources(self, phonems, fps):
+        """Returns a (store, frame ids) pair for each phonem, sampled at fps.
+        The store is the proxy of the phonem video if it is ready, otherwise
+        the list of decoded phonem frames.
+        """
+
+        sources = [None] * len(phonems)
+        missing = defaultdict(list)
+        for i, p in enumerate(phonems):
+            url = p.word.sentence.video.url
+            proxy = proxy_store.get(url)
+            if proxy is not None:
+                sources[i] = (
+                    proxy,
+                    proxy_store.get_frame_indexes(
+                        proxy, get_phonem_times(p, fps)
+                    ),
+                )
+                continue
+            try:
+                p_frames = frame_cache.get(get_phonem_key(p, fps))
+                sources[i] = (p_frames, np.arange(len(p_frames)))
+            except KeyError:
+                missing[url].append(i)
+
+        for url, indexes in missing.items():
+            times = {i: get_phonem_times(phonems[i], fps) for i in indexes}
+            all_times = np.unique(np.concatenate(list(times.values())))
+            decoded = self._decode(url, phonems[indexes[0]], all_times)
+            for i in indexes:
+                p_frames = [decoded[t] for t in times[i]]
+                frame_cache.put(get_phonem_key(phonems[i], fps), p_frames)
+                sources[i] = (p_frames, np.arange(len(p_frames)))
+
+        return sources
+
+    def extract(self, phonems, fps):
+        """Returns the list of frames of each phonem, sampled at fps"""
+        return [
+            [store[k] for k in frame_ids]
+            for store, frame_ids in self.extract_sources(phonems, fps)
+        ]
+
+    def _decode(self, url, p, times):
+        """Decodes the frames of the video of phonem p at sorted times"""
+
+        clip = p._get_original_video()
+        lock = self._get_lock(url)
+        lock.lock()
+        try:
+            return {
+                t: clip.get_frame(t)[::DOWNSCALE, ::DOWNSCALE].copy(order="C")
+                for t in times
+            }
+        finally:
+            lock.unlock()
+
+
+frame_extractor = FrameExtractor()
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class FrameSequence:
+    """Frames of a preview, stored as indexes into shared frame stores.
+
+    A store is an indexable sequence of frames: the memory-mapped proxy of a
+    source video, or the decoded frames of a phonem when the proxy is not
+    ready. Frame i of the sequence is stores[store_ids[i]][frame_ids[i]], so
+    combos using the same source frames do not copy them.
+    """
+
+    def __init__(self, stores, store_ids, frame_ids):
+        self.stores = stores
+        self.store_ids = np.asarray(store_ids, dtype=np.int32)
+        self.frame_ids = np.asarray(frame_ids, dtype=np.int32)
+
+    def from_sources(sources, store_ids, frame_ids):
+        """Builds a sequence from (store, phonem frame ids) sources, as
+        returned by FrameExtractor.extract_sources. store_ids index sources.
+        """
+
+        stores = []
+        positions = {}
+        source_to_store = np.empty(len(sources), dtype=np.int32)
+        for i, (store, _) in enumerate(sources):
+            if id(store) not in positions:
+                positions[id(store)] = len(stores)
+                stores.append(store)
+            source_to_store[i] = positions[id(store)]
+        return FrameSequence(
+            stores,
+            source_to_store[np.asarray(store_ids, dtype=np.int64)],
+            frame_ids,
+        )
+
+    @property
+    def nbytes(self):
+        """Size of the indexes and of the stores held in memory only"""
+        return (
+            self.store_ids.nbytes
+            + self.frame_ids.nbytes
+            + sum(
+                sum(f.nbytes for f in store)
+                for store in self.stores
+                if not isinstance(store, np.memmap)
+            )
+        )
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    def __getitem__(self, i):
+        return self.stores[self.store_ids[i]][self.frame_ids[i]]
+
+
+class LazyFrameSequence:
+    """Frames of a preview whose phonem sources are filled progressively.
+
+    Frame i comes from the phonem phonem_ids[i], at index local_ids[i] of the
+    phonem frames. Frames of phonems whose source is not set yet are taken
+    from loading_frames.
+    """
+
+    def __init__(self, n_phonems, phonem_ids, local_ids, loading_frames):
+        self.sources = [None] * n_phonems
+        self.phonem_ids = phonem_ids
+        self.local_ids = local_ids
+        self.loading_frames = loading_frames
+
+    def set_source(self, i, source):
+        """source is a (store, phonem frame ids) pair"""
+        self.sources[i] = source
+
+    def __len__(self):
+        return len(self.phonem_ids)
+
+    def __getitem__(self, i):
+        source = self.sources[self.phonem_ids[i]]
+        if source is None:
+            return self.loading_frames[i % len(self.loading_frames)]
+        store, frame_ids = source
+        return store[frame_ids[min(len(frame_ids) - 1, self.local_ids[i])]]
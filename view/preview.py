@@ -1,12 +1,39 @@
 # import threading
-import functools
+import itertools
+from collections import OrderedDict
 
 import numpy as np
 from moviepy.video.compositing.concatenate import concatenate_videoclips
 from PySide2 import QtCore, QtGui, QtMultimedia
-from sentence_mixing.video_creator.audio import concat_segments
 
-from worker import Worker
+from view.audio_cache import audio_cache
+from view.frame_cache import frame_cache
+from view.frame_extractor import frame_extractor
+from view.frame_store import FrameSequence, LazyFrameSequence
+from worker import WorkerSignals
+
+# Previewers hold their frames: keeping them all would defeat the frame cache
+MAX_PREVIEWS = 100
+
+# Number of previewers built at the same time
+MAX_PREVIEW_JOBS = max(1, QtCore.QThread.idealThreadCount() - 1)
+
+# Thread pool priority of the previews of the selected combo
+SELECTED_PRIORITY = 1
+
+# Number of combos prepared ahead of the played one by a timeline
+TIMELINE_LOOKAHEAD = 3
+
+# Time (in seconds) after the end of its audio at which a preview is ended,
+# if its audio output does not go idle
+AUDIO_END_MARGIN = 0.5
+
+
+def get_preview_key(combo):
+    """Combos are equal by sentence and index: their phonems tell apart the
+    combos of successive analyses of a sentence
+    """
+    return (combo, combo.get_phonems_key())
 
 
 def get_loading_frames(fps):
@@ -41,78 +68,238 @@ def get_format(rate, wave):
     return format
 
 
-video_cache = {}
+class WaveDevice(QtCore.QIODevice):
+    """Read only device streaming a waveform array to a QAudioOutput.
 
+    Reads are served from a view of the array, so the waveform is never
+    copied as a whole. A looping device starts over at the end of the
+    waveform instead of reaching it.
+    """
 
-def hash_phonems(phonems):
-    return sum(hash(str(p.start) + p.word.sentence.video.url) for p in phonems)
+    def __init__(self, wave, parent=None):
+        super(WaveDevice, self).__init__(parent)
+        self.wave = np.ascontiguousarray(wave)
+        self._data = memoryview(self.wave).cast("B")
+        self._pos = 0
+        self.loop = False
+
+    def set_loop(self, loop):
+        self.loop = loop
+
+    def open(self, mode):
+        self._pos = 0
+        return super(WaveDevice, self).open(mode)
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        return (
+            len(self._data)
+            - self._pos
+            + super(WaveDevice, self).bytesAvailable()
+        )
+
+    def atEnd(self):
+        return not self.loop and self._pos >= len(self._data)
+
+    def readData(self, maxlen):
+        size = len(self._data)
+        if size == 0:
+            return b""
+        if self.loop and self._pos >= size:
+            self._pos = 0
+        end = min(size, self._pos + maxlen)
+        chunk = bytes(self._data[self._pos : end])
+        self._pos = end
+        if self.loop and len(chunk) < maxlen:
+            # Wraps around in the same read, so the sound does not stutter
+            self._pos = min(size, maxlen - len(chunk))
+            chunk += bytes(self._data[: self._pos])
+        return chunk
+
+    def writeData(self, data):
+        return -1
+
+
+def get_from_cache(phonems_key, fps):
+    return frame_cache.get(("video_extract", phonems_key, fps))
+
+
+def add_to_cache(phonems_key, fps, frames):
+    frame_cache.put(("video_extract", phonems_key, fps), frames)
+
+
+def get_timeline_indexes(starts, ends, period):
+    """Samples the concatenation of the phonems every period.
+    Returns, for each sample, the index of its phonem and the index of the
+    sample in the phonem frames (themselves sampled every period from the
+    phonem start).
+    """
+
+    durations = np.maximum(np.asarray(ends) - np.asarray(starts), 0)
+    cumulated = np.concatenate(([0.0], np.cumsum(durations)))
+    times = np.arange(0, cumulated[-1], period)
+    phonem_ids = np.searchsorted(cumulated, times, side="right") - 1
+    phonem_ids = np.minimum(phonem_ids, len(durations) - 1)
+    local_ids = np.round((times - cumulated[phonem_ids]) / period).astype(
+        np.int64
+    )
+    return phonem_ids, local_ids
 
 
-def get_from_cache(phonems):
-    return video_cache[hash_phonems(phonems)]
+def get_frame_ids(sources, phonem_ids, local_ids):
+    """Maps timeline indexes (see get_timeline_indexes) to the frame ids of
+    the (store, phonem frame ids) sources
+    """
 
+    lengths = np.array([len(ids) for _, ids in sources], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    all_frame_ids = np.concatenate(
+        [ids for _, ids in sources] + [np.empty(0, dtype=np.int64)]
+    ).astype(np.int64)
 
-def add_to_cache(phonems, frames):
-    video_cache[hash_phonems(phonems)] = frames
+    return all_frame_ids[
+        offsets[phonem_ids] + np.minimum(lengths[phonem_ids] - 1, local_ids)
+    ]
 
 
 class Previewer:
-    def __init__(self, combo, fps=15, audio_phonems=None):
+    def __init__(
+        self, combo, fps=15, audio_phonems=None, phonems_key=None, lazy=False
+    ):
+        """phonems_key (see PhonemsKey) identifies audio_phonems in the frame
+        cache. It is taken from the combo when audio_phonems is not given.
+        A lazy previewer only waits for the audio: frames are decoded in the
+        background, and loading frames are displayed in the meantime.
+        """
+
         self.combo = combo
+        self.phonem_times = None
 
         # audio
         if combo is not None or audio_phonems is not None:
             if audio_phonems is None:
                 audio_phonems = combo.get_audio_phonems()
-            rate, wave = concat_segments(audio_phonems)
+                phonems_key = combo.get_phonems_key()
+                self.phonem_times = combo.get_phonem_times()
+            rate, wave = audio_cache.get_wave(audio_phonems, phonems_key)
             self.audio_format = get_format(rate, wave)
-            self.data = QtCore.QByteArray(wave.tobytes(order="C"))
-            self.audio_input = QtCore.QBuffer(self.data)
+            self.audio_input = WaveDevice(wave)
+            self.audio_duration = len(wave) / rate
         else:
             self.audio_format = None
-            self.data = None
             self.audio_input = None
+            self.audio_duration = 0
 
         self.timer = None
         self.audio_output = None
 
+        # Frames skipped to catch up with the audio, and timer ticks which
+        # had to skip frames
+        self.dropped_frames = 0
+        self.late_frames = 0
+
+        # Called when a preview which does not loop reaches its end
+        self.finished_callback = None
+
         self.fps = fps
 
         self.t = 0
         self.period_ms = 1.0 / fps
 
+        self.displayed_shape = None
+
+        # Phonems whose frames a lazy previewer has to decode, see
+        # fill_video_extract
+        self.pending_frames = None
+
         if audio_phonems is None:
             self.frames = get_loading_frames(fps)
+        elif lazy:
+            self.frames = self.get_lazy_video_extract(
+                audio_phonems, phonems_key
+            )
         else:
-            self.frames = self.get_video_extract(audio_phonems)
+            self.frames = self.get_video_extract(audio_phonems, phonems_key)
+
+    def get_video_extract(self, ps, phonems_key=None):
+        """Returns the frames of the phonems as a FrameSequence"""
 
-    def get_video_extract(self, ps):
-        frames = []
         try:
-            frames = get_from_cache(ps)
+            if phonems_key is None:
+                raise KeyError(phonems_key)
+            return get_from_cache(phonems_key, self.fps)
         except KeyError:
-            s = 0
-            for p in ps:
-                p_frames = self.get_phonem_frames(p)
-                start = p.start + s
-                p_range = np.arange(start, p.end, self.period_ms)
-                if len(p_range) == 0:
-                    s -= p.end - p.start
-                    continue
-                frames += [
-                    p_frames[min(len(p_frames) - 1, int(k))]
-                    for k in np.round((p_range - p.start) / self.period_ms)
-                ]
-                s = self.period_ms - (p.end - p_range[-1])
-            add_to_cache(ps, frames)
+            pass
+
+        # Decodes the frames of all the phonems at once
+        sources = frame_extractor.extract_sources(ps, self.fps)
+        store_ids, local_ids = self.get_timeline_indexes(ps)
+        frame_ids = get_frame_ids(sources, store_ids, local_ids)
+        frames = FrameSequence.from_sources(sources, store_ids, frame_ids)
+        if phonems_key is not None:
+            add_to_cache(phonems_key, self.fps, frames)
         return frames
 
-    @functools.lru_cache(maxsize=100)
-    def get_phonem_frames(self, p):
-        return [
-            p._get_original_video().get_frame(t)[::8, ::8].copy(order="C")
-            for t in np.arange(p.start, p.end, self.period_ms)
-        ]
+    def get_timeline_indexes(self, ps):
+        if self.phonem_times is not None:
+            starts, ends = self.phonem_times
+        else:
+            starts, ends = [p.start for p in ps], [p.end for p in ps]
+        return get_timeline_indexes(starts, ends, self.period_ms)
+
+    def get_lazy_video_extract(self, ps, phonems_key=None):
+        """Returns the frames of the phonems without decoding them, see
+        fill_video_extract
+        """
+
+        try:
+            if phonems_key is None:
+                raise KeyError(phonems_key)
+            return get_from_cache(phonems_key, self.fps)
+        except KeyError:
+            pass
+
+        store_ids, local_ids = self.get_timeline_indexes(ps)
+        frames = LazyFrameSequence(
+            len(ps), store_ids, local_ids, get_loading_frames(self.fps)
+        )
+        self.pending_frames = (ps, frames, phonems_key)
+        return frames
+
+    def has_pending_frames(self):
+        return self.pending_frames is not None
+
+    def fill_video_extract(self, interruption_callback=None):
+        """Decodes the frames of a lazy previewer in playing order, one run of
+        consecutive phonems of the same video at a time, so that each run is
+        decoded in a single pass over its video.
+        Returns False if interruption_callback stopped the decoding.
+        """
+
+        if self.pending_frames is None:
+            return True
+        ps, frames, phonems_key = self.pending_frames
+
+        sources = []
+        for _, run in itertools.groupby(
+            ps, key=lambda p: p.word.sentence.video.url
+        ):
+            if interruption_callback is not None and interruption_callback():
+                return False
+            for source in frame_extractor.extract_sources(list(run), self.fps):
+                frames.set_source(len(sources), source)
+                sources.append(source)
+
+        self.pending_frames = None
+        frame_ids = get_frame_ids(sources, frames.phonem_ids, frames.local_ids)
+        self.frames = FrameSequence.from_sources(
+            sources, frames.phonem_ids, frame_ids
+        )
+        if phonems_key is not None:
+            add_to_cache(phonems_key, self.fps, self.frames)
+        return True
 
     def __repr__(self):
         return f"<Preview for combo {self.combo}>"
@@ -123,22 +310,30 @@ class Previewer:
         self.graphics_view = graphics_view
 
         self.timer = QtCore.QTimer(self.graphics_view)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_frame)
 
-        self.timer.start(self.period_ms * 1000)
+        # Previews with audio are clocked by the audio output: the timer
+        # only samples it, twice per frame
+        if self.audio_format is not None:
+            self.timer.start(self.period_ms * 500)
+        else:
+            self.timer.start(self.period_ms * 1000)
         self.t = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
 
         if self.audio_format is not None:
             self.audio_output = QtMultimedia.QAudioOutput(
                 self.audio_format, self.graphics_view
             )
-            self.audio_output.stateChanged.connect(self.audio_state_handler)
             # start audio streaming
+            self.audio_input.set_loop(loop)
             self.audio_input.open(QtCore.QIODevice.ReadOnly)
             self.audio_output.start(self.audio_input)
 
+        self.displayed_shape = None
         self.display_frame()
-        self.graphics_view.fitInView(self.pixmap, QtCore.Qt.KeepAspectRatio)
 
     def pause(self):
         if self.timer is not None:
@@ -161,25 +356,175 @@ class Previewer:
             self.audio_input.close()
 
     def display_frame(self):
-        imdisplay(self.frames[self.t], self.pixmap)
+        frame = self.frames[self.t]
+        imdisplay(frame, self.pixmap)
+        # Loading frames and video frames do not have the same size
+        if frame.shape != self.displayed_shape:
+            self.displayed_shape = frame.shape
+            self.graphics_view.fitInView(
+                self.pixmap, QtCore.Qt.KeepAspectRatio
+            )
 
-    def audio_state_handler(self, state):
-        if state == QtMultimedia.QAudio.IdleState and self.loop:
-            self.audio_input.close()
-            self.audio_input = QtCore.QBuffer(self.data)
-            self.audio_input.open(QtCore.QIODevice.ReadWrite)
-            self.audio_output.start(self.audio_input)
+    def is_audio_finished(self):
+        """Returns True once the audio of a preview which does not loop has
+        been played
+        """
+
+        if self.loop:
+            return False
+        # processedUSecs runs ahead of the sound by the output buffer: the
+        # output goes idle once the buffer is drained
+        return (
+            self.audio_output.state() == QtMultimedia.QAudio.IdleState
+            or self.audio_output.processedUSecs() / 1e6
+            >= self.audio_duration + AUDIO_END_MARGIN
+        )
+
+    def get_audio_frame(self):
+        """Returns the index of the frame matching the audio being played"""
+
+        elapsed = self.audio_output.processedUSecs() / 1e6
+        if self.loop and self.audio_duration > 0:
+            elapsed %= self.audio_duration
+        return min(int(elapsed / self.period_ms), len(self.frames) - 1)
 
     def update_frame(self):
-        self.t += 1
-        if self.t >= len(self.frames):
+        if self.audio_output is None:
+            t = self.t + 1
+            finished = t >= len(self.frames)
+        else:
+            t = self.get_audio_frame()
+            finished = self.is_audio_finished()
+
+        if finished:
             if self.loop:
                 self.t = 0
                 self.display_frame()
             else:
                 self.stop()
-        else:
-            self.display_frame()
+                if self.finished_callback is not None:
+                    self.finished_callback()
+            return
+
+        if t == self.t:
+            # The audio has not reached the next frame yet
+            return
+        if t > self.t + 1:
+            self.dropped_frames += t - self.t - 1
+            self.late_frames += 1
+        self.t = t
+        self.display_frame()
+
+
+class TimelinePlayer:
+    """Plays combos one after the other.
+
+    The previews of the played combo and of the next lookahead combos are
+    requested from the preview manager, so only a few previews of the
+    timeline are held at once, and previews already built for the table
+    are reused. Loading frames are displayed while the preview of the
+    played combo is not ready.
+    """
+
+    def __init__(self, combos, lookahead=TIMELINE_LOOKAHEAD):
+        self.combo = None
+        self.combos = combos
+        self.lookahead = lookahead
+
+        self.previews = {}
+        self.current = None
+        self.i = 0
+
+        self.loop = False
+        self.running = False
+        self.paused = False
+
+    def __repr__(self):
+        return f"<Timeline of {len(self.combos)} combos>"
+
+    def _get_window(self):
+        return self.combos[self.i : self.i + 1 + self.lookahead]
+
+    def _request_window(self):
+        window = self._get_window()
+        for c in list(self.previews):
+            if c not in window:
+                self.previews.pop(c)
+        previewManager.compute_previews(
+            [c for c in window if c not in self.previews],
+            self._preview_ready,
+            owner=self,
+        )
+
+    def _preview_ready(self, p):
+        if not self.running or p.combo not in self._get_window():
+            return
+        self.previews[p.combo] = p
+        if self.current is None and p.combo == self.combos[self.i]:
+            blank_preview.stop()
+            self._play_current()
+
+    def _play_current(self):
+        if self.i >= len(self.combos):
+            if not self.loop or len(self.combos) == 0:
+                self.running = False
+                return
+            self.i = 0
+        self._request_window()
+
+        self.current = self.previews.get(self.combos[self.i])
+        if self.current is None:
+            # Resumes in _preview_ready
+            blank_preview.run(self.pixmap, self.graphics_view, True)
+            if self.paused:
+                blank_preview.pause()
+            return
+
+        self.current.finished_callback = self._play_next
+        self.current.run(self.pixmap, self.graphics_view, False)
+        if self.paused:
+            self.current.pause()
+
+    def _play_next(self):
+        self.current.finished_callback = None
+        self.current = None
+        self.i += 1
+        self._play_current()
+
+    def run(self, pixmap, graphics_view, loop=False):
+        self.pixmap = pixmap
+        self.graphics_view = graphics_view
+        self.loop = loop
+
+        self.running = True
+        self.paused = False
+        self.i = 0
+        self._play_current()
+
+    def pause(self):
+        self.paused = True
+        if self.current is not None:
+            self.current.pause()
+        elif self.running:
+            blank_preview.pause()
+
+    def unpause(self):
+        self.paused = False
+        if self.current is not None:
+            self.current.unpause()
+        elif self.running:
+            blank_preview.unpause()
+
+    def stop(self):
+        if self.current is not None:
+            self.current.finished_callback = None
+            self.current.stop()
+            self.current = None
+        elif self.running:
+            blank_preview.stop()
+        self.running = False
+        self.previews.clear()
+        previewManager.cancel(self)
 
 
 class Cancellation:
@@ -202,132 +547,213 @@ class Cancellation:
         return f"<Cancellation: {str(self.cancelled)}>"
 
 
+class PreviewJob(QtCore.QRunnable):
+    """Builds the previewer of a combo for every waiting caller, then decodes
+    its frames while it may be played.
+
+    The job is cancelled once the cancellations of all the segments waiting
+    for it are cancelled. A previewer whose frames are not all decoded is
+    then dropped.
+    """
+
+    def __init__(self, manager, combo, priority):
+        super(PreviewJob, self).__init__()
+        self.setAutoDelete(False)
+
+        self.manager = manager
+        self.combo = combo
+        self.key = get_preview_key(combo)
+        self.priority = priority
+        self.cancellations = set()
+        self.signals = WorkerSignals()
+
+    def is_cancelled(self):
+        """Must be called with the jobs lock of the manager locked, unless
+        the job is finished
+        """
+        return all(c.is_cancelled() for c in self.cancellations)
+
+    @QtCore.Slot()
+    def run(self):
+        p = None
+        try:
+            if not self.manager.is_job_cancelled(self):
+                p = Previewer(self.combo, lazy=True)
+        except Exception as e:
+            self.manager.finish_job(self, None)
+            self.signals.error.emit(str(e))
+            self.signals.finished.emit()
+            return
+
+        self.manager.finish_job(self, p)
+        if p is None:
+            self.signals.finished.emit()
+            return
+        if not self.manager.is_job_cancelled(self):
+            self.signals.result.emit(p)
+
+        complete = False
+        try:
+            complete = p.fill_video_extract(
+                lambda: self.manager.is_job_cancelled(self)
+            )
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        finally:
+            self.manager.finish_filling(self, p, complete)
+            self.signals.finished.emit()
+
+
 class __PreviewManager:
-    def __init__(self):
-        self.previews = dict()
+    """Builds previewers in a bounded thread pool.
+
+    There is at most one job per combo: later requests for the same combo
+    wait for the running job. Previews and jobs are keyed by combo and
+    phonems (see get_preview_key). Requests are cancelled by segment, and the
+    preview of the selected combo is built before the others.
+    """
+
+    def __init__(self, max_jobs=None):
+        self.previews = OrderedDict()
         self.previous_lock = QtCore.QReadWriteLock()
 
+        # In flight jobs, by preview key
         self.jobs = dict()
-        self.jobs_lock = QtCore.QReadWriteLock()
-
-        self.first = None
-        self.first_lock = QtCore.QReadWriteLock()
+        # Jobs decoding the frames of a previewer of self.previews, by
+        # preview key
+        self.filling_jobs = dict()
+        # Cancellation of the pending requests, by segment
+        self.cancellations = dict()
+        self.jobs_lock = QtCore.QMutex()
 
-        self.queue = QtCore.QSemaphore(1)
+        self.thread_pool = QtCore.QThreadPool()
+        if max_jobs is not None:
+            self.thread_pool.setMaxThreadCount(max_jobs)
 
     def get_preview_if_in_previews(self, combo):
         p = None
-        self.previous_lock.lockForRead()
-        if combo in self.previews:
-            p = self.previews[combo]
+        key = get_preview_key(combo)
+        # Write lock: a hit makes the preview the most recently used one
+        self.previous_lock.lockForWrite()
+        if key in self.previews:
+            p = self.previews[key]
+            self.previews.move_to_end(key)
         self.previous_lock.unlock()
         return p
 
-    def get_first(self):
-        self.first_lock.lockForRead()
-        first = self.first
-        self.first_lock.unlock()
-        return first
+    def is_in_previews(self, combo):
+        return self.get_preview_if_in_previews(combo) is not None
 
-    def set_first(self, job):
-        self.first_lock.lockForWrite()
-        self.first = job
-        self.first_lock.unlock()
+    def _get_cancellation(self, owner):
+        if owner not in self.cancellations:
+            self.cancellations[owner] = Cancellation()
+        return self.cancellations[owner]
 
-    def is_in_previews(self, combo):
-        self.jobs_lock.lockForRead()
-        is_in_previews = combo in self.previews
-        self.jobs_lock.unlock()
-        return is_in_previews
+    def _request(self, combo, callback, priority, owner):
+        """Must be called with jobs_lock locked"""
+
+        cancellation = self._get_cancellation(
+            combo.segment if owner is None else owner
+        )
 
-    def get_preview(self, combo):
+        key = get_preview_key(combo)
         p = self.get_preview_if_in_previews(combo)
         if p is not None:
-            return p
-        return self.__create_preview(combo)
-
-    def get_cancellation(self, combo):
-        cancellation = Cancellation()
-        self.jobs_lock.lockForWrite()
-        if combo not in self.jobs:
-            self.jobs[combo] = set()
-        self.jobs[combo].add(cancellation)
+            if key in self.filling_jobs:
+                self.filling_jobs[key].cancellations.add(cancellation)
+            if callback is not None:
+                QtCore.QTimer.singleShot(0, lambda: callback(p))
+            return
+
+        job = self.jobs.get(key)
+        if job is None:
+            job = PreviewJob(self, combo, priority)
+            job.signals.error.connect(print)
+            self.jobs[key] = job
+            self.thread_pool.start(job, priority)
+        elif priority > job.priority and self.thread_pool.tryTake(job):
+            # Not started yet: queued again with the higher priority
+            job.priority = priority
+            self.thread_pool.start(job, priority)
+
+        job.cancellations.add(cancellation)
+        if callback is not None:
+            # The job emits its result after leaving self.jobs
+            job.signals.result.connect(callback)
+
+    def is_job_cancelled(self, job):
+        self.jobs_lock.lock()
+        cancelled = job.is_cancelled()
+        self.jobs_lock.unlock()
+        return cancelled
+
+    def finish_job(self, job, p):
+        self.jobs_lock.lock()
+        if self.jobs.get(job.key) is job:
+            self.jobs.pop(job.key)
+        if p is not None:
+            self.previous_lock.lockForWrite()
+            self.previews[job.key] = p
+            while len(self.previews) > MAX_PREVIEWS:
+                self.previews.popitem(last=False)
+            self.previous_lock.unlock()
+            if p.has_pending_frames():
+                self.filling_jobs[job.key] = job
         self.jobs_lock.unlock()
-        return cancellation
 
-    def delete_job(self, combo, job):
-        self.jobs_lock.lockForWrite()
-        if combo in self.jobs:
-            if job in self.jobs[combo]:
-                self.jobs[combo].remove(job)
+    def finish_filling(self, job, p, complete):
+        """Drops the previewer p of the job if its frames are not complete"""
+
+        self.jobs_lock.lock()
+        if self.filling_jobs.get(job.key) is job:
+            self.filling_jobs.pop(job.key)
+        if not complete:
+            self.previous_lock.lockForWrite()
+            if self.previews.get(job.key) is p:
+                self.previews.pop(job.key)
+            self.previous_lock.unlock()
         self.jobs_lock.unlock()
 
-    def __create_preview(self, combo):
-        job = self.get_cancellation(combo)
-        enqueue = True
-        while enqueue:
-            self.queue.acquire(1)
-            p = self.get_preview_if_in_previews(combo)
-            if p is not None:
-                self.queue.release(1)
-                self.delete_job(combo, job)
-                return p
-            first = self.get_first()
-            enqueue = first != job
-            if self.first is None:
-                self.set_first(job)
-            if enqueue:
-                self.queue.release(1)
-        self.set_first(None)
-        if job.is_cancelled():
-            self.queue.release(1)
-            self.delete_job(combo, job)
-            return
-        p = Previewer(combo)
-        self.previous_lock.lockForWrite()
-        self.previews[combo] = p
-        self.previous_lock.unlock()
-        self.queue.release(1)
-        self.delete_job(combo, job)
-        if job.is_cancelled():
-            return
-        return p
+    def compute_previews(self, combos, callback=None, priority=0, owner=None):
+        """Builds the previews of combos in the background. callback is
+        called in the GUI thread with each preview that is not cancelled.
+        Requests are cancelled with cancel(owner), the owner defaulting to
+        the segment of each combo.
+        """
 
-    def __compute_previews(self, combos):
-        cancelled_segments = set()
-        p = None
+        self.jobs_lock.lock()
         for c in combos:
-            if c.segment not in cancelled_segments:
-                self.jobs_lock.lockForRead()
-                self.jobs_lock.unlock()
-                p = self.get_preview(c)
-                if p is None:
-                    cancelled_segments.add(c.segment)
-        return p
+            self._request(c, callback, priority, owner)
+        self.jobs_lock.unlock()
 
-    def compute_previews(self, thread_pool, combos, callback=None):
-        w = Worker(self.__compute_previews, combos)
-        if callback is not None:
-            w.signals.result.connect(callback)
-        thread_pool.start(w)
-
-    def cancel(self, segment):
-        self.jobs_lock.lockForWrite()
-        for c in segment.combos:
-            if c in self.jobs:
-                for job in self.jobs[c]:
-                    job.cancel()
-                self.jobs.pop(c)
+    def _take_jobs(self, cancelled):
+        """Removes the queued jobs whose requests are all cancelled.
+        Must be called with jobs_lock locked.
+        """
+
+        for key, job in list(self.jobs.items()):
+            if job.cancellations & cancelled and job.is_cancelled():
+                if self.thread_pool.tryTake(job):
+                    self.jobs.pop(key)
+                    job.signals.finished.emit()
+
+    def cancel(self, owner):
+        self.jobs_lock.lock()
+        cancellation = self.cancellations.pop(owner, None)
+        if cancellation is not None:
+            cancellation.cancel()
+            self._take_jobs({cancellation})
         self.jobs_lock.unlock()
 
     def cancel_all(self):
-        self.jobs_lock.lockForWrite()
-        for c in list(self.jobs.keys()):
-            for job in self.jobs[c]:
-                job.cancel()
-            self.jobs.pop(c)
+        self.jobs_lock.lock()
+        cancelled = set(self.cancellations.values())
+        for cancellation in cancelled:
+            cancellation.cancel()
+        self.cancellations.clear()
+        self._take_jobs(cancelled)
         self.jobs_lock.unlock()
 
 
-previewManager = __PreviewManager()
+previewManager = __PreviewManager(MAX_PREVIEW_JOBS)
 blank_preview = Previewer(None)
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+from moviepy.video.io.VideoFileClip import VideoFileClip
+from PySide2 import QtCore
+
+# Only one pixel out of DOWNSCALE is kept in each direction
+DOWNSCALE = 8
+
+# Frame rate of the proxies, also used by previews
+PROXY_FPS = 15
+PROXY_EXTENSION = f".proxy{PROXY_FPS}.npy"
+
+
+def get_video_path(video):
+    return video._base_path + "." + video.extension
+
+
+def get_proxy_path(video):
+    return video._base_path + PROXY_EXTENSION
+
+
+def write_proxy(video_path, proxy_path, interruption_callback=None):
+    """Decodes the video once and writes its downscaled frames, sampled at
+    PROXY_FPS, in a npy file
+    """
+
+    clip = VideoFileClip(video_path, audio=False)
+    try:
+        n_frames = int(clip.duration * PROXY_FPS)
+        width, height = clip.size
+        shape = (
+            n_frames,
+            -(-height // DOWNSCALE),
+            -(-width // DOWNSCALE),
+            3,
+        )
+
+        tmp_path = proxy_path + ".tmp"
+        frames = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.uint8, shape=shape
+        )
+        for i, frame in enumerate(
+            clip.iter_frames(fps=PROXY_FPS, dtype="uint8")
+        ):
+            if i >= n_frames:
+                break
+            if interruption_callback is not None and interruption_callback():
+                del frames
+                os.remove(tmp_path)
+                return
+            frames[i] = frame[::DOWNSCALE, ::DOWNSCALE]
+        frames.flush()
+        del frames
+        os.replace(tmp_path, proxy_path)
+    finally:
+        clip.close()
+
+
+class ProxyStore:
+    """Low resolution proxies of the source videos.
+
+    A proxy is a uint8 array of shape (frames, height, width, 3) sampled at
+    PROXY_FPS, memory-mapped from disk: reading a preview frame is an array
+    index, without any decoding. Frames are C contiguous and can be given to
+    QImage directly.
+    """
+
+    def __init__(self):
+        self._proxies = {}
+        self._lock = QtCore.QReadWriteLock()
+
+    def get(self, url):
+        """Returns the proxy of the video, or None if it is not ready"""
+
+        self._lock.lockForRead()
+        proxy = self._proxies.get(url)
+        self._lock.unlock()
+        return proxy
+
+    def create(self, video, interruption_callback=None):
+        """Writes the proxy of the video if needed, and loads it"""
+
+        if self.get(video.url) is not None:
+            return
+
+        video_path = get_video_path(video)
+        proxy_path = get_proxy_path(video)
+        if not os.path.exists(proxy_path) or os.path.getmtime(
+            proxy_path
+        ) < os.path.getmtime(video_path):
+            write_proxy(video_path, proxy_path, interruption_callback)
+            if not os.path.exists(proxy_path):
+                return
+
+        # Copy on write mapping: QImage needs a writable buffer
+        proxy = np.load(proxy_path, mmap_mode="c")
+
+        self._lock.lockForWrite()
+        self._proxies[video.url] = proxy
+        self._lock.unlock()
+
+    def get_frame_indexes(self, proxy, times):
+        return np.clip(
+            np.round(np.asarray(times) * PROXY_FPS).astype(np.int64),
+            0,
+            len(proxy) - 1,
+        )
+
+
+proxy_store = ProxyStore()
@@ -9,6 +9,7 @@ class WorkerSignals(QtCore.QObject):
     finished = QtCore.Signal()
     error = QtCore.Signal(str)
     result = QtCore.Signal(object)
+    partial_result = QtCore.Signal(object)
     progress = QtCore.Signal(int)
 
 
@@ -59,6 +60,7 @@ class AnalysisState(Enum):
 
 class AnalyzeWorker(Worker, QtCore.QObject):
     stateChanged = QtCore.Signal(str)
+    combosAdded = QtCore.Signal(str)
 
     def __init__(self, segment):
         QtCore.QObject.__init__(self)
@@ -69,7 +71,10 @@ class AnalyzeWorker(Worker, QtCore.QObject):
 
     def analyze_segment(self, interrupt_callback):
         try:
-            self.segment.analyze(interrupt_callback)
+            self.segment.analyze(
+                interrupt_callback,
+                lambda: self.combosAdded.emit(self.segment.get_sentence()),
+            )
             self.stateChanged.emit(self.segment.get_sentence())
         except Interruption:
             print(
@@ -79,13 +84,114 @@ class AnalyzeWorker(Worker, QtCore.QObject):
             )
 
 
+class AnalysisPriority(Enum):
+    SELECTED = 0
+    VISIBLE = 1
+    NEEDED = 2
+    BACKGROUND = 3
+
+
+class AnalyzeScheduler:
+    """Launches analysis workers by priority, with a bounded number of
+    running analyses.
+
+    Priorities are given by segment sets pushed from the GUI thread (selected
+    rows, rows visible in the table, rows needed by a preview or an export),
+    and evaluated each time a running analysis slot is freed. Pending workers
+    of the same priority are launched in scheduling order.
+    """
+
+    def __init__(self, threadpool, max_running=None):
+        self.threadpool = threadpool
+        if max_running is None:
+            max_running = max(1, QtCore.QThread.idealThreadCount())
+        self.max_running = max_running
+
+        self._pending = []
+        self._running = set()
+        self._selected = set()
+        self._visible = set()
+        self._needed = set()
+        self._lock = QtCore.QMutex()
+
+    def get_priority(self, segment):
+        if segment in self._selected:
+            return AnalysisPriority.SELECTED
+        if segment in self._visible:
+            return AnalysisPriority.VISIBLE
+        if segment in self._needed:
+            return AnalysisPriority.NEEDED
+        return AnalysisPriority.BACKGROUND
+
+    def set_priorities(self, selected, visible):
+        """Sets the selected and visible segments, and launches pending
+        analyses accordingly
+        """
+
+        self._lock.lock()
+        self._selected = set(selected)
+        self._visible = set(visible)
+        self._lock.unlock()
+        self._launch()
+
+    def set_needed(self, segments):
+        """Marks segments needed for a preview or an export"""
+
+        self._lock.lock()
+        self._needed = set(segments)
+        self._lock.unlock()
+        self._launch()
+
+    def schedule(self, worker):
+        worker.signals.finished.connect(lambda: self._worker_finished(worker))
+
+        self._lock.lock()
+        self._pending.append(worker)
+        self._lock.unlock()
+        self._launch()
+
+    def unschedule(self, worker):
+        """Removes a worker that has not been launched yet.
+        Returns False if the worker is already running.
+        """
+
+        self._lock.lock()
+        removed = worker in self._pending
+        if removed:
+            self._pending.remove(worker)
+        self._lock.unlock()
+        return removed
+
+    def _worker_finished(self, worker):
+        self._lock.lock()
+        self._running.discard(worker)
+        self._lock.unlock()
+        self._launch()
+
+    def _launch(self):
+        self._lock.lock()
+        while len(self._running) < self.max_running and len(self._pending) > 0:
+            # min keeps the first of the workers with the best priority
+            worker = min(
+                self._pending, key=lambda w: self.get_priority(w.segment).value
+            )
+            self._pending.remove(worker)
+            self._running.add(worker)
+            self.threadpool.start(worker)
+        self._lock.unlock()
+
+
 class AnalyzeWorkerPool:
     def __init__(self, segment_model, threadpool):
         self.segment_model = segment_model
         self.threadpool = threadpool
+        self.scheduler = AnalyzeScheduler(threadpool)
         self._worker_dict = {}
 
-    def add_worker(self, segment, finished, result, error):
+    def __contains__(self, segment):
+        return segment in self._worker_dict
+
+    def add_worker(self, segment, finished, result, error, progress=None):
         @QtCore.Slot()
         def compute_finish():
             finished()
@@ -99,6 +205,9 @@ class AnalyzeWorkerPool:
         worker.signals.result.connect(result)
         worker.signals.error.connect(error)
         worker.stateChanged.connect(self.segment_model.analysis_state_changed)
+        worker.combosAdded.connect(self.segment_model.analysis_progressed)
+        if progress is not None:
+            worker.combosAdded.connect(progress)
 
         self._worker_dict[segment] = worker
 
@@ -108,15 +217,22 @@ class AnalyzeWorkerPool:
                 "This segment has not associated worker. PLease launch add_worker"
             )
 
-        self.threadpool.start(self._worker_dict[segment])
+        self.scheduler.schedule(self._worker_dict[segment])
 
-    def add_launch_worker(self, segment, finished, result, error):
-        self.add_worker(segment, finished, result, error)
+    def add_launch_worker(
+        self, segment, finished, result, error, progress=None
+    ):
+        self.add_worker(segment, finished, result, error, progress)
         self.launch_thread(segment)
 
     def interrupt_worker(self, segment):
-        if segment in self._worker_dict:
-            self._worker_dict[segment].interrupt()
-        raise KeyError(
-            "This segment has not associated worker. PLease launch add_worker"
-        )
+        if segment not in self._worker_dict:
+            raise KeyError(
+                "This segment has not associated worker. PLease launch add_worker"
+            )
+
+        worker = self._worker_dict[segment]
+        worker.interrupt()
+        # A worker that never ran must still release its segment
+        if self.scheduler.unschedule(worker):
+            worker.signals.finished.emit()